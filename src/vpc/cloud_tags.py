@@ -0,0 +1,308 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import atexit
+import base64
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TAG_FLUSH_INTERVAL = 2  # seconds between batched attach/detach calls.
+TAG_BATCH_SIZE = 100  # max resources per attach/detach call, as limited by the tagging api.
+SEARCH_PAGE_SIZE = 1000
+ENCODED_PREFIX = "b32."  # marks values encoded since they contain characters user tags don't preserve.
+_PLAIN_VALUE = re.compile("^[a-z0-9_. -]*$")  # user tags are case insensitive and limited to [A-Za-z0-9_ .-:]
+
+
+def encode_tag(key, value):
+    """returns the user tag representing the ray tag key=value"""
+    value = str(value)
+    if not _PLAIN_VALUE.match(value) or value.startswith(ENCODED_PREFIX):
+        value = ENCODED_PREFIX + base64.b32encode(value.encode()).decode().lower().rstrip("=")
+    return f"{key}:{value}"
+
+
+def decode_tag(tag):
+    """returns (key, value) of a user tag created by encode_tag, or None for other tags"""
+    key, sep, value = tag.partition(":")
+    if not sep or not key.startswith("ray-"):
+        return None
+    if value.startswith(ENCODED_PREFIX):
+        encoded = value[len(ENCODED_PREFIX):].upper()
+        value = base64.b32decode(encoded + "=" * (-len(encoded) % 8)).decode()
+    return key, value
+
+
+def _node_id(crn):
+    """returns the id of the instance or bare metal server identified by crn"""
+    return crn.split(":")[-1]
+
+
+class CloudTagStore:
+    """Ray node tags stored as IBM Cloud user tags on the nodes themselves.
+
+    Unlike the head's local ~/.ray-vpc-tags, these are visible to any process with the cluster's
+    credentials, and all of them are loaded with a single Global Search query. Changes are batched:
+    set_tags only records the diff against the known cloud tags, which is applied by a background
+    thread every TAG_FLUSH_INTERVAL seconds with one attach/detach call per distinct set of resources,
+    and once more at exit, so short lived processes such as `ray up` don't lose their last changes.
+
+    Requires ibm_platform_services, unless tagging_service and search_service are specified,
+    e.g. a LocalTaggingService in tests.
+    """
+
+    def __init__(self, authenticator, cluster_name, resolve_crn, tagging_service=None, search_service=None):
+        """
+        Args:
+            authenticator(Authenticator): IBM Cloud authenticator of the cluster.
+            cluster_name(str): value of cluster_name within the cluster's config file.
+            resolve_crn(callable): returns the crn of a node id whose crn wasn't registered.
+            tagging_service: GlobalTaggingV1 compatible client.
+            search_service: GlobalSearchV2 compatible client.
+        """
+        if not tagging_service or not search_service:
+            try:
+                from ibm_platform_services import GlobalSearchV2, GlobalTaggingV1
+            except ImportError:
+                raise Exception(
+                    "tag_backend: cloud requires ibm_platform_services. "
+                    "install it using `pip install ibm-vpc-ray-connector[cloud_tags]`"
+                )
+            tagging_service = tagging_service or GlobalTaggingV1(authenticator=authenticator)
+            search_service = search_service or GlobalSearchV2(authenticator=authenticator)
+
+        self.tagging_service = tagging_service
+        self.search_service = search_service
+        self.cluster_name = cluster_name
+        self.resolve_crn = resolve_crn
+        self.lock = threading.RLock()
+        self.thread = None
+
+        self.crns = {}  # {node_id: crn}
+        self.cloud_tags = {}  # {node_id: {key: value}} tags known to be attached, or queued for attachment.
+        self.to_attach = {}  # {node_id: set(tag)}
+        self.to_detach = {}  # {node_id: set(tag)}
+        atexit.register(self._flush_at_exit)
+
+    def register(self, node_id, crn):
+        with self.lock:
+            self.crns[node_id] = crn
+
+    def forget(self, node_id):
+        """drops a deleted node. its user tags are removed by the cloud alongside it."""
+        with self.lock:
+            for registry in [self.crns, self.cloud_tags, self.to_attach, self.to_detach]:
+                registry.pop(node_id, None)
+
+    def load(self):
+        """returns {node_id: tags} of all the cluster's nodes, with a single (paginated) search query"""
+        query = f'tags:"{encode_tag("ray-cluster-name", self.cluster_name)}"'
+        nodes_tags = {}
+        search_cursor = None
+        while True:
+            result = self.search_service.search(
+                query=query, fields=["crn", "tags"], search_cursor=search_cursor, limit=SEARCH_PAGE_SIZE
+            ).get_result()
+            for item in result["items"]:
+                tags = dict(filter(None, (decode_tag(tag) for tag in item.get("tags", []))))
+                node_id = _node_id(item["crn"])
+                nodes_tags[node_id] = tags
+                with self.lock:
+                    self.crns[node_id] = item["crn"]
+                    self.cloud_tags[node_id] = dict(tags)
+
+            search_cursor = result.get("search_cursor")
+            if len(result["items"]) < SEARCH_PAGE_SIZE or not search_cursor:
+                break
+
+        logger.debug(f"loaded cloud tags of {len(nodes_tags)} nodes")
+        return nodes_tags
+
+    def set_tags(self, node_id, tags):
+        """
+        queues the changes needed for the cloud tags of node_id to match tags.
+        Args:
+            node_id(str): id of the node.
+            tags(dict): all ray tags of the node.
+        """
+        with self.lock:
+            current = self.cloud_tags.setdefault(node_id, {})
+            for key, value in tags.items():
+                if current.get(key) == value:
+                    continue
+                if key in current:
+                    old_tag = encode_tag(key, current[key])
+                    self.to_attach.get(node_id, set()).discard(old_tag)
+                    self.to_detach.setdefault(node_id, set()).add(old_tag)
+                new_tag = encode_tag(key, value)
+                self.to_detach.get(node_id, set()).discard(new_tag)
+                self.to_attach.setdefault(node_id, set()).add(new_tag)
+                current[key] = value
+
+            if not self.thread:
+                self.thread = threading.Thread(target=self._run, name="ray-vpc-cloud-tags", daemon=True)
+                self.thread.start()
+
+    def _batches(self, pending):
+        """groups {node_id: set(tag)} into [(crns, tag_names)] with one entry per distinct set of resources"""
+        by_tag = {}
+        for node_id, tags in pending.items():
+            crn = self.crns.get(node_id)
+            if not crn:
+                crn = self.resolve_crn(node_id)
+                self.register(node_id, crn)
+            for tag in tags:
+                by_tag.setdefault(tag, set()).add(crn)
+
+        by_resources = {}
+        for tag, crns in by_tag.items():
+            by_resources.setdefault(frozenset(crns), []).append(tag)
+
+        for crns, tag_names in by_resources.items():
+            crns = sorted(crns)
+            for i in range(0, len(crns), TAG_BATCH_SIZE):
+                yield crns[i:i + TAG_BATCH_SIZE], tag_names
+
+    def flush(self):
+        """applies queued attach/detach changes. changes that failed, for all or some of the resources, are requeued."""
+        with self.lock:
+            to_detach, self.to_detach = self.to_detach, {}
+            to_attach, self.to_attach = self.to_attach, {}
+
+        failed_detach = {}
+        failed_attach = {}
+        try:
+            for crns, tag_names in self._batches(to_detach):
+                response = self.tagging_service.detach_tag(
+                    resources=[{"resource_id": crn} for crn in crns], tag_names=tag_names, tag_type="user"
+                )
+                self._collect_failures(response, tag_names, failed_detach)
+            to_detach = {}
+            for crns, tag_names in self._batches(to_attach):
+                response = self.tagging_service.attach_tag(
+                    resources=[{"resource_id": crn} for crn in crns], tag_names=tag_names, tag_type="user"
+                )
+                self._collect_failures(response, tag_names, failed_attach)
+        except Exception:
+            for node_id, tags in failed_detach.items():
+                to_detach.setdefault(node_id, set()).update(tags)
+            self._requeue(to_detach, to_attach)
+            raise
+
+        if failed_detach or failed_attach:
+            # e.g. missing permissions to tag some of the resources. the calls themselves succeed.
+            self._requeue(failed_detach, failed_attach)
+            logger.warning(f"failed to update cloud tags of {sorted(set(failed_detach) | set(failed_attach))}, retrying")
+
+    def _collect_failures(self, response, tag_names, failed):
+        """adds tag_names to failed {node_id: set(tag)} for each resource reported as failed in an attach/detach response"""
+        with self.lock:
+            nodes = {crn: node_id for node_id, crn in self.crns.items()}
+        for result in response.get_result().get("results", []):
+            node_id = nodes.get(result.get("resource_id"))
+            if result.get("is_error") and node_id:
+                failed.setdefault(node_id, set()).update(tag_names)
+
+    def _requeue(self, to_detach, to_attach):
+        """requeues changes, unless superseded by changes made in the meantime. attach and detach are idempotent."""
+        with self.lock:
+            for pending, queue, opposite in [
+                (to_detach, self.to_detach, self.to_attach),
+                (to_attach, self.to_attach, self.to_detach),
+            ]:
+                for node_id, tags in pending.items():
+                    if node_id in self.cloud_tags:
+                        tags = tags - opposite.get(node_id, set())
+                        queue.setdefault(node_id, set()).update(tags)
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"failed to update cloud tags at exit: {e}")
+
+    def _run(self):
+        while True:
+            time.sleep(TAG_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"failed to update cloud tags, retrying: {e}")
+
+
+class _Response:
+    """mimics the DetailedResponse returned by IBM Cloud sdk calls"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def get_result(self):
+        return self.result
+
+
+class LocalTaggingService:
+    """In-memory stand-in for both the GlobalTaggingV1 and GlobalSearchV2 clients used by CloudTagStore.
+
+    Implements attach_tag, detach_tag and search queries of the form `tags:"<tag>"`, e.g. in tests:
+    CloudTagStore(None, cluster_name, resolve_crn, tagging_service=service, search_service=service)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resources = {}  # {crn: set(tag)}
+        self.calls = []  # [(method, crns, tag_names)] for inspecting batching.
+        self.failing = set()  # crns whose tag updates are reported as failed, e.g. for lack of permissions.
+
+    def attach_tag(self, *, resources, tag_names, tag_type="user", **kwargs):
+        with self.lock:
+            crns = [r["resource_id"] for r in resources]
+            self.calls.append(("attach_tag", crns, list(tag_names)))
+            for crn in crns:
+                if crn not in self.failing:
+                    self.resources.setdefault(crn, set()).update(t.lower() for t in tag_names)
+        return _Response({"results": [{"resource_id": crn, "is_error": crn in self.failing} for crn in crns]})
+
+    def detach_tag(self, *, resources, tag_names, tag_type="user", **kwargs):
+        with self.lock:
+            crns = [r["resource_id"] for r in resources]
+            self.calls.append(("detach_tag", crns, list(tag_names)))
+            for crn in crns:
+                if crn not in self.failing:
+                    self.resources.get(crn, set()).difference_update(t.lower() for t in tag_names)
+        return _Response({"results": [{"resource_id": crn, "is_error": crn in self.failing} for crn in crns]})
+
+    def delete_resource(self, crn):
+        """simulates deletion of a tagged resource"""
+        with self.lock:
+            self.resources.pop(crn, None)
+
+    def search(self, *, query, fields=None, search_cursor=None, limit=SEARCH_PAGE_SIZE, **kwargs):
+        match = re.match('^tags:"(.*)"$', query)
+        if not match:
+            raise ValueError(f"unsupported query {query}")
+        tag = match.group(1).lower()
+
+        with self.lock:
+            crns = sorted(crn for crn, tags in self.resources.items() if tag in tags)
+            start = int(search_cursor or 0)
+            page = crns[start:start + limit]
+            items = [{"crn": crn, "tags": sorted(self.resources[crn])} for crn in page]
+
+        next_cursor = str(start + limit) if start + limit < len(crns) else None
+        return _Response({"items": items, "limit": limit, "search_cursor": next_cursor})
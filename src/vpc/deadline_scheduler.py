@@ -0,0 +1,89 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineScheduler:
+    """Min-heap of deadlines, expired on a background thread.
+
+    Each key has at most one active deadline. cancelled and rescheduled deadlines are left in the heap
+    and skipped when popped, so schedule and cancel are O(log n) and O(1) respectively.
+    """
+
+    def __init__(self, on_expired, name="ray-vpc-deadlines"):
+        """
+        Args:
+            on_expired(callable): called with the key of each expired deadline, on the scheduler's thread.
+            name(str): name of the scheduler's thread.
+        """
+        self.on_expired = on_expired
+        self.name = name
+        self.heap = []  # [(deadline, key)]
+        self.deadlines = {}  # {key: deadline} active deadlines.
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, key, timeout):
+        """sets the deadline of key to `timeout` seconds from now, replacing an active one"""
+        deadline = time.time() + timeout
+        with self.condition:
+            self.deadlines[key] = deadline
+            heapq.heappush(self.heap, (deadline, key))
+            if not self.thread:
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def cancel(self, key):
+        """drops the active deadline of key, if any"""
+        with self.condition:
+            self.deadlines.pop(key, None)
+
+    def _pop_expired(self):
+        """blocks until a deadline expires, then returns its key"""
+        with self.condition:
+            while True:
+                # drop cancelled and rescheduled entries
+                while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+                    heapq.heappop(self.heap)
+
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                deadline, key = self.heap[0]
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+
+                heapq.heappop(self.heap)
+                self.deadlines.pop(key)
+                return key
+
+    def _run(self):
+        while True:
+            key = self._pop_expired()
+            try:
+                self.on_expired(key)
+            except Exception as e:
+                logger.error(f"failed to handle expired deadline of {key}: {e}")
@@ -0,0 +1,260 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import argparse
+import calendar
+import concurrent.futures as cf
+import json
+import logging
+import threading
+import time
+
+from ibm_cloud_sdk_core import ApiException
+
+from vpc.volume_pool import pooled_volume_expiry
+
+logger = logging.getLogger(__name__)
+
+GC_GRACE_MINUTES = 10  # resources younger than this are never collected, as they may be mid creation/attachment.
+GC_CONCURRENCY = 8  # max concurrent delete calls.
+GC_RATE = 5  # max delete calls per second.
+
+
+def _list_all(list_func, key, **filters):
+    """returns all resources of a paginated VPC list call, passing it filters such as vpc_id"""
+    result = list_func(**filters).get_result()
+    resources = result[key]
+    while result.get("next"):
+        start = result["next"]["href"].split("start=")[1]
+        result = list_func(start=start, **filters).get_result()
+        resources.extend(result[key])
+    return resources
+
+
+def _age_minutes(resource):
+    """returns the age in minutes of a VPC resource according to its created_at field"""
+    created_at = calendar.timegm(time.strptime(resource["created_at"][:19], "%Y-%m-%dT%H:%M:%S"))
+    return (time.time() - created_at) / 60
+
+
+class _RateLimiter:
+    """spaces calls to wait() at least 1/rate seconds apart, across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            call_at = max(self.next_call, now)
+            self.next_call = call_at + self.interval
+        time.sleep(call_at - now)
+
+
+class GarbageCollector:
+    """Finds and deletes resources leaked by the cluster's node provider.
+
+    Only resources of the cluster are considered: those named with the cluster's recyclable prefix, within
+    the cluster's VPCs and resource groups (see add_scope). Resources are inventoried in bulk, one paginated
+    list call per resource type and scope, and diffed against the live instances and bare metal servers and
+    the provider's tag store:
+      - floating_ips: unbound floating ips created by this package for the cluster.
+      - volumes: unattached boot volumes created by this package for the cluster, that aren't pooled for reuse.
+        pooled volumes are recognized by their name, see pooled_volume_name, and are collected once expired.
+      - placement_groups: empty placement groups created by this package for the cluster, that the provider isn't using.
+      - tags: tag store entries of nodes that no longer exist.
+    Orphans are deleted concurrently, rate limited to GC_RATE calls per second.
+    """
+
+    def __init__(self, provider, recyclable_prefix):
+        """
+        Args:
+            provider(IBMVPCNodeProvider): node provider of the cluster.
+            recyclable_prefix(str): name prefix of resources created by this package for the cluster.
+        """
+        self.provider = provider
+        self.ibm_vpc_client = provider.ibm_vpc_client
+        self.recyclable_prefix = recyclable_prefix
+        self.lock = threading.Lock()
+        self.scopes = set()  # {(vpc_id, resource_group_id)} the cluster's nodes are created in.
+        self.rate_limiter = _RateLimiter(GC_RATE)
+        self.thread = None
+
+    def add_scope(self, node_config):
+        """
+        adds the VPC and resource group of a node type to the resources considered by the collector.
+        Args:
+            node_config(dict): node_config segment of a node type of the cluster's config file.
+        """
+        if node_config.get("vpc_id") and node_config.get("resource_group_id"):
+            with self.lock:
+                self.scopes.add((node_config["vpc_id"], node_config["resource_group_id"]))
+
+    def find_orphans(self):
+        """returns the cluster's leaked resources: {resource type: [resource]}"""
+        with self.lock:
+            vpc_ids = {vpc_id for vpc_id, _ in self.scopes}
+            resource_group_ids = {resource_group_id for _, resource_group_id in self.scopes}
+        if not vpc_ids:
+            raise Exception("the cluster's vpc and resource group are unknown, refusing to collect garbage")
+
+        nodes = []
+        for vpc_id in vpc_ids:
+            nodes.extend(_list_all(self.ibm_vpc_client.list_instances, "instances", vpc_id=vpc_id))
+            nodes.extend(_list_all(self.ibm_vpc_client.list_bare_metal_servers, "bare_metal_servers", vpc_id=vpc_id))
+        live_ids = {node["id"] for node in nodes}
+        used_placement_groups = {node["placement_target"]["id"] for node in nodes if node.get("placement_target")}
+
+        def collectable(resource):
+            return (
+                resource["name"].startswith(self.recyclable_prefix)
+                and resource["resource_group"]["id"] in resource_group_ids
+                and _age_minutes(resource) > GC_GRACE_MINUTES
+            )
+
+        floating_ips = []
+        for resource_group_id in resource_group_ids:
+            ips = _list_all(self.ibm_vpc_client.list_floating_ips, "floating_ips", resource_group_id=resource_group_id)
+            floating_ips.extend(ip for ip in ips if collectable(ip) and not ip.get("target"))
+
+        # the pool's records are local to the process that pooled the volumes, hence also consulting their names
+        with self.provider.volume_pool.lock:
+            locally_pooled = {v["id"] for v in self.provider.volume_pool.volumes}
+
+        def pooled(volume):
+            expires_at = pooled_volume_expiry(self.recyclable_prefix, volume["name"])
+            return volume["id"] in locally_pooled or (expires_at and expires_at + GC_GRACE_MINUTES * 60 > time.time())
+
+        volumes = [
+            v for v in _list_all(self.ibm_vpc_client.list_volumes, "volumes", attachment_state="unattached")
+            if collectable(v) and not v.get("volume_attachments") and not pooled(v)
+        ]
+
+        with self.provider.lock:
+            used_placement_groups.update(g["id"] for g in self.provider.placement_groups.values())
+        placement_groups = [
+            g for g in _list_all(self.ibm_vpc_client.list_placement_groups, "placement_groups")
+            if collectable(g) and g["id"] not in used_placement_groups
+        ]
+
+        with self.provider.lock:
+            tags = [
+                node_id for node_id in self.provider.nodes_tags
+                if node_id not in live_ids and node_id not in self.provider.pending_nodes
+            ]
+
+        return {
+            "floating_ips": floating_ips,
+            "volumes": volumes,
+            "placement_groups": placement_groups,
+            "tags": tags,
+        }
+
+    def _delete(self, delete_func, resource):
+        self.rate_limiter.wait()
+        try:
+            delete_func(resource["id"])
+            logger.info(f"garbage collected {resource['name']} {resource['id']}")
+        except ApiException as e:
+            if e.code != 404:
+                logger.warning(f"failed to garbage collect {resource['name']} {resource['id']}: {e}")
+
+    def sweep(self, dry_run=False):
+        """
+        returns a report of the cluster's leaked resources, see find_orphans. deletes them unless dry_run.
+        Args:
+            dry_run(bool): only report leaked resources.
+        """
+        orphans = self.find_orphans()
+        report = {
+            "floating_ips": [{"id": ip["id"], "name": ip["name"], "address": ip["address"]} for ip in orphans["floating_ips"]],
+            "volumes": [{"id": v["id"], "name": v["name"]} for v in orphans["volumes"]],
+            "placement_groups": [{"id": g["id"], "name": g["name"]} for g in orphans["placement_groups"]],
+            "tags": orphans["tags"],
+        }
+        if dry_run:
+            return report
+
+        with self.provider.lock:
+            for node_id in orphans["tags"]:
+                self.provider.nodes_tags.pop(node_id, None)
+                if self.provider.cloud_tags:
+                    self.provider.cloud_tags.forget(node_id)
+            # calling set_node_tags with None will dump self.nodes_tags cache to file
+            self.provider.set_node_tags(None, None)
+
+        futures = []
+        with cf.ThreadPoolExecutor(GC_CONCURRENCY) as ex:
+            for ip in orphans["floating_ips"]:
+                futures.append(ex.submit(self._delete, self.ibm_vpc_client.delete_floating_ip, ip))
+            for volume in orphans["volumes"]:
+                futures.append(ex.submit(self._delete, self.ibm_vpc_client.delete_volume, volume))
+            for group in orphans["placement_groups"]:
+                futures.append(ex.submit(self._delete, self.ibm_vpc_client.delete_placement_group, group))
+
+        for future in cf.as_completed(futures):
+            future.result()
+
+        # groups deleted behind the provider's back are recreated on their next use
+        for group in orphans["placement_groups"]:
+            self.provider._uncache_placement_group(group["id"])
+
+        return report
+
+    def start(self, interval_minutes):
+        """sweeps every `interval_minutes` on a daemon thread"""
+        if self.thread:
+            return
+        self.thread = threading.Thread(
+            target=self._run, args=(interval_minutes,), name="ray-vpc-gc", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, interval_minutes):
+        while True:
+            time.sleep(interval_minutes * 60)
+            try:
+                report = self.sweep()
+                if any(report.values()):
+                    logger.info(f"garbage collection sweep: {report}")
+            except Exception as e:
+                logger.warning(f"garbage collection sweep failed: {e}")
+
+
+def main():
+    """on-demand sweep of a cluster's leaked resources, e.g. `python -m vpc.garbage_collector cluster.yaml --dry-run`"""
+    import yaml
+
+    from vpc.node_provider import IBMVPCNodeProvider
+
+    parser = argparse.ArgumentParser(description="garbage collect resources leaked by an IBM VPC ray cluster")
+    parser.add_argument("config", help="the cluster's config file")
+    parser.add_argument("--dry-run", action="store_true", help="only report leaked resources")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+
+    provider = IBMVPCNodeProvider(config["provider"], config["cluster_name"])
+    for node_type in config["available_node_types"].values():
+        provider.garbage_collector.add_scope(node_type["node_config"])
+    print(json.dumps(provider.collect_garbage(dry_run=args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import logging
+import threading
+from pathlib import Path
+from uuid import uuid4
+
+from ibm_cloud_sdk_core import ApiException
+from ray.autoscaler.tags import (
+    STATUS_UP_TO_DATE,
+    TAG_RAY_FILE_MOUNTS_CONTENTS,
+    TAG_RAY_NODE_STATUS,
+    TAG_RAY_RUNTIME_CONFIG,
+)
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_IMAGES = ".ray-vpc-golden-images"  # local record of the golden boot volume snapshots of each cluster.
+GOLDEN_IMAGE_PREFIX = "ray-golden"  # identifies golden boot volume snapshots created by this package.
+
+
+class GoldenImages:
+    """Golden boot volume snapshots of set up workers, keyed by node type and runtime config hash.
+
+    Once the first worker of a node type with `golden_image: True` in its node_config reports
+    `up-to-date`, its boot volume is snapshotted. Subsequent workers of that node type boot from the
+    snapshot and are tagged with the runtime config hash it was taken with, which makes the ray
+    updater skip file mounts, initialization and setup commands.
+
+    A boot volume snapshot is used rather than a custom image, since IBM VPC only creates images
+    from volumes of stopped instances, while snapshots can be taken of a running worker.
+
+    Records are kept in ~/.ray-vpc-golden-images:
+    {cluster_name: {"images": {node_type: record}, "stale": [snapshot_id]}}
+    """
+
+    def __init__(self, ibm_vpc_client, cluster_name):
+        self.ibm_vpc_client = ibm_vpc_client
+        self.cluster_name = cluster_name
+        self.lock = threading.RLock()
+        self.enabled_node_types = {}  # {node_type: node_config} of node types with golden_image enabled.
+        self.capturing = set()  # node types with a snapshot being taken.
+
+        self.images_file = Path.home() / GOLDEN_IMAGES
+        self.images = {}
+        self.stale = []
+        if self.images_file.is_file():
+            cluster_images = json.loads(self.images_file.read_text()).get(self.cluster_name, {})
+            self.images = cluster_images.get("images", {})
+            self.stale = cluster_images.get("stale", [])
+
+    def _dump(self):
+        """dumps in-memory records to the local file"""
+        all_images = {}
+        if self.images_file.is_file():
+            all_images = json.loads(self.images_file.read_text())
+        all_images[self.cluster_name] = {"images": self.images, "stale": self.stale}
+        self.images_file.write_text(json.dumps(all_images))
+
+    def enable(self, node_type, node_config):
+        """registers node_type for golden image capture"""
+        with self.lock:
+            self.enabled_node_types[node_type] = node_config
+
+    def lookup(self, node_type):
+        """returns the golden image record of node_type if it is ready to boot from, otherwise None."""
+        with self.lock:
+            if node_type not in self.enabled_node_types:
+                return None
+            record = self.images.get(node_type)
+            if not record:
+                return None
+            if record.get("stable"):
+                return record
+
+        try:
+            snapshot = self.ibm_vpc_client.get_snapshot(record["snapshot_id"]).get_result()
+        except ApiException as e:
+            if e.code != 404:
+                raise e
+            logger.warning(f"golden snapshot {record['snapshot_id']} of {node_type} not found, dropping it")
+            with self.lock:
+                if self.images.get(node_type) is record:
+                    self.images.pop(node_type)
+                    self._dump()
+            return None
+
+        state = snapshot["lifecycle_state"]
+        if state == "stable":
+            with self.lock:
+                record["stable"] = True
+                self._dump()
+            return record
+        if state in ["failed", "deleting", "deleted"]:
+            logger.warning(f"golden snapshot {record['snapshot_id']} of {node_type} is {state}, dropping it")
+            with self.lock:
+                if self.images.get(node_type) is record:
+                    self.images.pop(node_type)
+                    self.stale.append(record["snapshot_id"])
+                    self._dump()
+        return None
+
+    @staticmethod
+    def node_tags(record):
+        """returns the tags marking a node booted from record as already set up"""
+        tags = {TAG_RAY_RUNTIME_CONFIG: record["runtime_hash"]}
+        if record.get("file_mounts_hash"):
+            tags[TAG_RAY_FILE_MOUNTS_CONTENTS] = record["file_mounts_hash"]
+        return tags
+
+    def node_updated(self, node_id, node_type, tags):
+        """called when ray sets node tags. captures a golden image once a worker of an enabled node type is set up,
+        and retires images taken with a previous runtime config.
+        Args:
+            node_id(str): id of the updated node.
+            node_type(str): ray user node type of the node.
+            tags(dict): the node's tags after the update.
+        """
+        if tags.get(TAG_RAY_NODE_STATUS) != STATUS_UP_TO_DATE:
+            return
+        runtime_hash = tags.get(TAG_RAY_RUNTIME_CONFIG)
+        file_mounts_hash = tags.get(TAG_RAY_FILE_MOUNTS_CONTENTS)
+
+        with self.lock:
+            node_config = self.enabled_node_types.get(node_type)
+            if not node_config or not runtime_hash or node_type in self.capturing:
+                return
+
+            record = self.images.get(node_type)
+            if record and record["runtime_hash"] == runtime_hash and record.get("file_mounts_hash") == file_mounts_hash:
+                return
+
+            if record:
+                logger.info(f"runtime config of {node_type} changed, retiring golden snapshot {record['snapshot_id']}")
+                self.images.pop(node_type)
+                self.stale.append(record["snapshot_id"])
+                self._dump()
+
+            self.capturing.add(node_type)
+
+        threading.Thread(
+            target=self._capture,
+            args=(node_id, node_type, node_config, runtime_hash, file_mounts_hash),
+            daemon=True,
+        ).start()
+
+    def _capture(self, node_id, node_type, node_config, runtime_hash, file_mounts_hash):
+        """snapshots the boot volume of node_id and records it as the golden image of node_type"""
+        try:
+            instance = self.ibm_vpc_client.get_instance(node_id).get_result()
+            volume_id = instance["boot_volume_attachment"]["volume"]["id"]
+
+            snapshot_prototype = {
+                "name": f"{GOLDEN_IMAGE_PREFIX}-{runtime_hash[:12]}-{uuid4().hex[:4]}",
+                "source_volume": {"id": volume_id},
+                "resource_group": {"id": node_config["resource_group_id"]},
+            }
+            logger.info(f"capturing golden snapshot of {node_type} from {node_id}")
+            snapshot = self.ibm_vpc_client.create_snapshot(snapshot_prototype).get_result()
+
+            with self.lock:
+                self.images[node_type] = {
+                    "snapshot_id": snapshot["id"],
+                    "runtime_hash": runtime_hash,
+                    "file_mounts_hash": file_mounts_hash,
+                    "stable": False,
+                }
+                self._dump()
+        except Exception as e:
+            logger.error(f"failed to capture golden snapshot of {node_type} from {node_id}: {e}")
+        finally:
+            with self.lock:
+                self.capturing.discard(node_type)
+
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        """deletes snapshots taken with an outdated runtime config. failed deletions are retried on the next call."""
+        with self.lock:
+            stale = list(self.stale)
+
+        for snapshot_id in stale:
+            try:
+                self.ibm_vpc_client.delete_snapshot(snapshot_id)
+                logger.info(f"deleted stale golden snapshot {snapshot_id}")
+            except ApiException as e:
+                if e.code != 404:
+                    logger.warning(f"failed to delete stale golden snapshot {snapshot_id}: {e}")
+                    continue
+
+            with self.lock:
+                if snapshot_id in self.stale:
+                    self.stale.remove(snapshot_id)
+                    self._dump()
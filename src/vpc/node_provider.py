@@ -15,6 +15,7 @@
 #
 
 import concurrent.futures as cf
+import hashlib
 import inspect
 import json
 import logging
@@ -41,19 +42,42 @@ from ray.autoscaler.tags import (
     TAG_RAY_CLUSTER_NAME,
     TAG_RAY_NODE_KIND,
     TAG_RAY_NODE_NAME,
+    TAG_RAY_USER_NODE_TYPE,
 )
 
+from vpc.cloud_tags import CloudTagStore
+from vpc.deadline_scheduler import DeadlineScheduler
+from vpc.garbage_collector import GarbageCollector
+from vpc.golden_images import GoldenImages
+from vpc.profile_fallbacks import ProfileFallbacks
+from vpc.token_cache import SharedIAMAuthenticator
+from vpc.volume_pool import POOL_MAX_GB_DEFAULT, BootVolumePool
+
 LOGS_FOLDER = "/tmp/connector_logs/"   # this node_provider's logs location. 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
+package_logger = logging.getLogger("vpc")  # parent of the loggers of all modules in this package
+package_logger.setLevel(logging.DEBUG)
 
 INSTANCE_NAME_UUID_LEN = 8
 INSTANCE_NAME_MAX_LEN = 64
-PENDING_TIMEOUT = 120  #  a node of this age that isn't running, will be removed from the cluster.    
+PENDING_TIMEOUT = 120  #  default age (seconds) at which a node that isn't running is removed from the cluster. overridden by `pending_timeout` in node_config.
 PROFILE_NAME_DEFAULT = "cx2-2x4"
 VOLUME_TIER_NAME_DEFAULT = "general-purpose"
+BOOT_VOLUME_CAPACITY_DEFAULT = 100
 RAY_RECYCLABLE = "ray-recyclable"  # identifies resources created by this package. these resources are deleted alongside the node.  
 VPC_TAGS = ".ray-vpc-tags"
+RECYCLABLE_CLUSTER_NAME_LEN = 16  # max length of the cluster name within names of resources created by this package.
+GC_INTERVAL_MINUTES = 30  # default interval of the head node's background sweep of leaked resources.
+PLACEMENT_STRATEGIES = ["host_spread", "power_spread"]
+PLACEMENT_GROUP_READY_TIMEOUT = 60  # seconds to wait for a newly created placement group to become stable.
+TAG_PLACEMENT_GROUP = "ray-placement-group"  # id of the placement group a node was created in.
+TAG_PLACEMENT_STRATEGY = "ray-placement-strategy"
+TAG_VPC_RESOURCE_TYPE = "ray-vpc-resource-type"  # set to BARE_METAL_SERVER for nodes provisioned as bare metal servers, a hint until their data is fetched.
+BARE_METAL_SERVER = "bare_metal_server"
+PENDING_RETRY_INTERVAL = 30  # seconds to wait before retrying to handle an expired pending node that failed.
+BARE_METAL_PENDING_TIMEOUT = 1800  # default pending timeout of bare metal servers, which take much longer to provision than VSIs.
+BARE_METAL_STATUSES = {"restarting": "starting", "maintenance": "pending"}  # bare metal statuses mapped to instance statuses.
 
 
 def _get_vpc_client(endpoint, authenticator):
@@ -77,7 +101,8 @@ class IBMVPCNodeProvider(NodeProvider):
     tool. Install it using `pip install ibm-ray-config`, run it with --pr flag,
     choose `Ray IBM VPC` and follow interactive wizard.
 
-    Currently, instance tagging is implemented using internal cache
+    Instance tagging is implemented using internal cache, dumped to a local file. with `tag_backend: cloud`
+    tags are also stored as IBM Cloud user tags on the instances, see CloudTagStore.
 
     To communicate with head node from outside cluster private network,
     `use_hybrid_ips` set to True. Then, floating (external) ip allocated to
@@ -114,6 +139,34 @@ class IBMVPCNodeProvider(NodeProvider):
 
         self.tags_file = Path.home() / VPC_TAGS
 
+        # cloud tags are visible from any machine, and are loaded with a single query instead of validating instances one by one
+        if self.cloud_tags:
+            cloud_tags = self.cloud_tags.load()
+            if cloud_tags:
+                local_tags = {}
+                if self.tags_file.is_file():
+                    local_tags = json.loads(self.tags_file.read_text()).get(self.cluster_name, {})
+
+                all_tags = list(cloud_tags.values()) + list(local_tags.values())
+                tagged_bare_metal = any(t.get(TAG_VPC_RESOURCE_TYPE) == BARE_METAL_SERVER for t in all_tags)
+                nodes = {node["id"]: node for node in self._list_nodes(self.bare_metal or tagged_bare_metal)}
+
+                # global search is eventually consistent, and changes reach the cloud in batches, while the local cache is
+                # written on every change. so the search may return deleted nodes, miss new ones or miss their latest tags,
+                # and the local cache wins where it has a node's tags. the cloud catches up with the merged tags.
+                for node_id in set(cloud_tags) | set(local_tags):
+                    if node_id not in nodes or nodes[node_id]["status"] in ["deleting", "failed"]:
+                        logger.warning(f"node {node_id} no longer exists, and will be removed from cache")
+                        continue
+                    node_tags = dict(cloud_tags.get(node_id, {}), **local_tags.get(node_id, {}))
+                    self.nodes_tags[node_id] = node_tags
+                    if node_tags != cloud_tags.get(node_id):
+                        self.cloud_tags.register(node_id, nodes[node_id]["crn"])
+                        self.cloud_tags.set_tags(node_id, node_tags)
+                self.set_node_tags(None, None)  # dump in-memory cache to local cache (file).
+                self._init_head_tags()
+                return
+
         # local tags cache exists from former runs 
         if self.tags_file.is_file():
             all_tags = json.loads(self.tags_file.read_text())
@@ -122,7 +175,9 @@ class IBMVPCNodeProvider(NodeProvider):
             # filters instances that were deleted since the last time the head node was up
             for instance_id, instance_tags in tags.items():
                 try: 
-                    instance = self.ibm_vpc_client.get_instance(instance_id).get_result()
+                    instance = self._get_vpc_node(
+                        instance_id, True if instance_tags.get(TAG_VPC_RESOURCE_TYPE) == BARE_METAL_SERVER else None
+                    )
                     if instance and instance["status"] not in ["deleting","failed"]:
                         self.nodes_tags[instance_id] = instance_tags
                     else:
@@ -140,35 +195,41 @@ class IBMVPCNodeProvider(NodeProvider):
             self.set_node_tags(None, None)  # dump in-memory cache to local cache (file). 
  
         else:
-            name = socket.gethostname() # returns the instance's (VSI) name 
-            logger.debug(f"Check if {name} is HEAD")
-
-            if self._get_node_type(name) == NODE_KIND_HEAD: 
-                logger.debug(f"{name} is HEAD")
-                node = self.ibm_vpc_client.list_instances(name=name).get_result()[
-                    "instances"
-                ]
-                if node:
-                    logger.debug(f"{name} is node in vpc")
-
-                    ray_bootstrap_config = Path.home() / "ray_bootstrap_config.yaml"  # reads the cluster's config file (an initialized defaults.yaml)
-                    config = json.loads(ray_bootstrap_config.read_text())
-                    (runtime_hash, mounts_contents_hash) = hash_runtime_conf(
-                        config["file_mounts"], None, config
-                    )
-
-                    head_tags = {
-                        TAG_RAY_NODE_KIND: NODE_KIND_HEAD,
-                        "ray-node-name": name,
-                        "ray-node-status": "up-to-date",
-                        "ray-cluster-name": self.cluster_name,
-                        "ray-user-node-type": config["head_node_type"],
-                        "ray-runtime-config": runtime_hash,
-                        "ray-file-mounts-contents": mounts_contents_hash,
-                    }
+            self._init_head_tags()
+
+    def _init_head_tags(self):
+        """initializes the head's tags (runtime hash, up-to-date status) when running on the head node"""
+        name = socket.gethostname() # returns the instance's (VSI) name 
+        logger.debug(f"Check if {name} is HEAD")
+
+        if self._get_node_type(name) == NODE_KIND_HEAD: 
+            logger.debug(f"{name} is HEAD")
+            node = self.ibm_vpc_client.list_instances(name=name).get_result()[
+                "instances"
+            ]
+            if node:
+                logger.debug(f"{name} is node in vpc")
+
+                ray_bootstrap_config = Path.home() / "ray_bootstrap_config.yaml"  # reads the cluster's config file (an initialized defaults.yaml)
+                config = json.loads(ray_bootstrap_config.read_text())
+                (runtime_hash, mounts_contents_hash) = hash_runtime_conf(
+                    config["file_mounts"], None, config
+                )
 
-                    logger.debug(f"Setting HEAD node tags {head_tags}")
-                    self.set_node_tags(node[0]["id"], head_tags)
+                head_tags = {
+                    TAG_RAY_NODE_KIND: NODE_KIND_HEAD,
+                    "ray-node-name": name,
+                    "ray-node-status": "up-to-date",
+                    "ray-cluster-name": self.cluster_name,
+                    "ray-user-node-type": config["head_node_type"],
+                    "ray-runtime-config": runtime_hash,
+                    "ray-file-mounts-contents": mounts_contents_hash,
+                }
+
+                logger.debug(f"Setting HEAD node tags {head_tags}")
+                if self.cloud_tags:
+                    self.cloud_tags.register(node[0]["id"], node[0]["crn"])
+                self.set_node_tags(node[0]["id"], head_tags)
 
     def __init__(self, provider_config, cluster_name):
         """
@@ -187,16 +248,64 @@ class IBMVPCNodeProvider(NodeProvider):
         self.iam_api_key = self.provider_config["iam_api_key"]
         self.iam_endpoint = self.provider_config.get("iam_endpoint")
 
-        self.ibm_vpc_client = _get_vpc_client(
-            self.endpoint, IAMAuthenticator(self.iam_api_key, url=self.iam_endpoint)
+        # by default IAM tokens are shared with the other ray processes on this host via a file cache
+        if self.provider_config.get("iam_token_cache", True):
+            authenticator = SharedIAMAuthenticator(self.iam_api_key, url=self.iam_endpoint)
+        else:
+            authenticator = IAMAuthenticator(self.iam_api_key, url=self.iam_endpoint)
+
+        self.ibm_vpc_client = _get_vpc_client(self.endpoint, authenticator)
+
+        # optionally store tags as IBM Cloud user tags, shared by every process with the cluster's credentials
+        self.cloud_tags = None
+        if self.provider_config.get("tag_backend", "local") == "cloud":
+            self.cloud_tags = CloudTagStore(
+                authenticator, self.cluster_name, lambda node_id: self._get_vpc_node(node_id)["crn"]
+            )
+
+        # golden boot volume snapshots of set up workers, for node types with `golden_image: True` in their node_config
+        self.golden_images = GoldenImages(self.ibm_vpc_client, self.cluster_name)
+
+        # name prefix of floating ips, boot volumes and placement groups created for the cluster
+        self.recyclable_prefix = self._recyclable_prefix()
+
+        # detached boot volumes reused by new nodes, for node types with `boot_volume_pool` in their node_config
+        self.volume_pool = BootVolumePool(
+            self.ibm_vpc_client,
+            self.cluster_name,
+            self.recyclable_prefix,
+            self.provider_config.get("boot_volume_pool_max_gb", POOL_MAX_GB_DEFAULT),
         )
 
-        self._load_tags()
+        self.cached_nodes = {} # Cache of starting/running/pending(below pending timeout) nodes. {node_id:node_data}.
+
+        # bare metal servers are only listed if the cluster may have them, see _may_have_bare_metal.
+        # processes other than the head, e.g. `ray down` from a laptop, rely on `bare_metal: True` under `provider`.
+        bootstrap_config = self._bootstrap_config()
+        self.bare_metal = bool(self.provider_config.get("bare_metal")) or any(
+            node_type["node_config"].get("bare_metal_profile_name")
+            for node_type in (bootstrap_config or {}).get("available_node_types", {}).values()
+        )
 
-        self.cached_nodes = {} # Cache of starting/running/pending(below PENDING_TIMEOUT) nodes. {node_id:node_data}.
+        self._load_tags()
         self.pending_nodes = {} # cache of the nodes created, but not yet tagged and running. {node_id:time_of_creation}.
         self.deleted_nodes = [] # ids of nodes scheduled for deletion.
 
+        # expires pending nodes off the autoscaler's polling path, see _pending_node_expired
+        self.pending_deadlines = DeadlineScheduler(self._pending_node_expired, name="ray-vpc-pending-nodes")
+        self.profile_fallbacks = ProfileFallbacks() # profiles of node types with `fallback_instance_profile_names` that timed out pending.
+        self.placement_groups = {} # {placement group name: placement group data} of groups nodes are created in.
+        self.placement_group_locks = {} # {placement group name: lock} serializing the lookup and creation of each group.
+
+        # sweeps resources leaked by crashed heads and nodes deleted outside ray. runs in the background on the head node,
+        # scoped to the vpcs and resource groups of the cluster's node types.
+        self.garbage_collector = GarbageCollector(self, self.recyclable_prefix)
+        gc_interval = self.provider_config.get("gc_interval_minutes", GC_INTERVAL_MINUTES)
+        if gc_interval and bootstrap_config:
+            for node_type in bootstrap_config["available_node_types"].values():
+                self.garbage_collector.add_scope(node_type["node_config"])
+            self.garbage_collector.start(gc_interval)
+
         # if cache_stopped_nodes == true, nodes will be stopped instead of deleted to accommodate future rise in demand  
         self.cache_stopped_nodes = provider_config.get("cache_stopped_nodes", True)
 
@@ -206,6 +315,38 @@ class IBMVPCNodeProvider(NodeProvider):
         elif f"{self.cluster_name}-{NODE_KIND_HEAD}" in name:
             return NODE_KIND_HEAD
 
+    def _bootstrap_config(self):
+        """returns the cluster's config when running on the head node, otherwise None"""
+        ray_bootstrap_config = Path.home() / "ray_bootstrap_config.yaml"  # an initialized defaults.yaml
+        if self._get_node_type(socket.gethostname()) == NODE_KIND_HEAD and ray_bootstrap_config.is_file():
+            return json.loads(ray_bootstrap_config.read_text())
+        return None
+
+    def _may_have_bare_metal(self):
+        """returns True if the cluster may have bare metal nodes: configured, created by this process or tagged as such"""
+        if self.bare_metal:
+            return True
+        with self.lock:
+            return any(tags.get(TAG_VPC_RESOURCE_TYPE) == BARE_METAL_SERVER for tags in self.nodes_tags.values())
+
+    def _list_nodes(self, bare_metal=None):
+        """
+        returns all VSIs in the region, and its bare metal servers, mapped by _bare_metal_as_node, if the cluster may have them.
+        Args:
+            bare_metal(bool): whether to list bare metal servers. defaults to _may_have_bare_metal.
+        """
+        result = self.ibm_vpc_client.list_instances().get_result()
+        instances = result["instances"]
+        while result.get("next"):
+            start = result["next"]["href"].split("start=")[1]
+            result = self.ibm_vpc_client.list_instances(start=start).get_result()
+            instances.extend(result["instances"])
+
+        # spares VSI only clusters a second list call on the autoscaler's polling path
+        if bare_metal or (bare_metal is None and self._may_have_bare_metal()):
+            instances.extend(self._list_bare_metal_servers())
+        return instances
+
     def _get_nodes_by_tags(self, filters):
         """ 
         returns list of nodes who's tags are matching the specified filters. 
@@ -216,18 +357,13 @@ class IBMVPCNodeProvider(NodeProvider):
         nodes = []
         # either no filters were specified or the only filter is the type of the node
         if not filters or list(filters.keys()) == [TAG_RAY_NODE_KIND]:
-            result = self.ibm_vpc_client.list_instances().get_result()
-            instances = result["instances"]
-            while result.get("next"):
-                start = result["next"]["href"].split("start=")[1]
-                result = self.ibm_vpc_client.list_instances(start=start).get_result()
-                instances.extend(result["instances"])
-
-            for instance in instances:
+            for instance in self._list_nodes():
                 kind = self._get_node_type(instance["name"])
                 if kind and instance["id"] not in self.deleted_nodes:
                     if not filters or kind == filters[TAG_RAY_NODE_KIND]:
                         nodes.append(instance)
+                        if self.cloud_tags:
+                            self.cloud_tags.register(instance["id"], instance["crn"])
                         with self.lock:
                             node_cache = self.nodes_tags.setdefault(instance["id"], {})
                             node_cache.update(
@@ -250,7 +386,7 @@ class IBMVPCNodeProvider(NodeProvider):
                         )
                         continue
                     try:
-                        nodes.append(self.ibm_vpc_client.get_instance(node_id).result)
+                        nodes.append(self._get_vpc_node(node_id))
                     except Exception as e:
                         cli_logger.warning(node_id)
                         if e.message == "Instance not found":
@@ -270,7 +406,7 @@ class IBMVPCNodeProvider(NodeProvider):
             tag_filters(dict): specified conditions by which nodes will be filtered. 
         """
 
-        res_nodes = []  # collecting valid nodes that are either starting, running or pending (below PENDING_TIMEOUT threshold)
+        res_nodes = []  # collecting valid nodes that are either starting, running or pending (below pending timeout threshold)
 
         found_nodes = self._get_nodes_by_tags(tag_filters)
 
@@ -291,21 +427,10 @@ class IBMVPCNodeProvider(NodeProvider):
                 )
                 continue
 
-            # validate instance not hanging in pending state
+            # a running node is no longer subject to its pending timeout. hanging nodes are handled by _pending_node_expired
             with self.lock:
-                if node["id"] in self.pending_nodes:
-                    if node["status"] != "running":
-                        pending_time = time.time() - self.pending_nodes[node["id"]]
-                        logger.debug(f"{node['id']} is pending for {pending_time}")
-                        if pending_time > PENDING_TIMEOUT:
-                            logger.error(
-                                f"pending timeout {PENDING_TIMEOUT} reached, "
-                                f"deleting instance {node['id']}"
-                            )
-                            self._delete_node(node["id"])  # we won't try to restart a failed node even if  
-                            continue  # avoid adding the node to cached_nodes and move on the next one
-                    else:
-                        self.pending_nodes.pop(node["id"], None)
+                if node["id"] in self.pending_nodes and node["status"] == "running":
+                    self._pending_node_running(node["id"])
 
             # if node is a head node, validate a floating ip is bound to it 
             if self._get_node_type(node["name"]) == NODE_KIND_HEAD:
@@ -423,6 +548,122 @@ class IBMVPCNodeProvider(NodeProvider):
             all_tags[self.cluster_name] = self.nodes_tags
             self.tags_file.write_text(json.dumps(all_tags))
 
+            # queue the node's tags for a batched update of its cloud tags
+            if self.cloud_tags and node_id and tags:
+                self.cloud_tags.set_tags(node_id, self.nodes_tags[node_id])
+
+            if node_id and tags and self.nodes_tags[node_id].get(TAG_RAY_NODE_KIND) == NODE_KIND_WORKER:
+                node_tags = self.nodes_tags[node_id]
+                self.golden_images.node_updated(node_id, node_tags.get(TAG_RAY_USER_NODE_TYPE), node_tags)
+
+    @staticmethod
+    def _is_bare_metal_data(node):
+        """returns True if node data, as returned by the VPC api, describes a bare metal server"""
+        return node.get("resource_type") == BARE_METAL_SERVER or ":bare-metal-server:" in node.get("crn", "")
+
+    def _is_bare_metal(self, node_id):
+        """returns True if node_id is a bare metal server. determined by the node's data, which is fetched if not cached."""
+        with self.lock:
+            node = self.cached_nodes.get(node_id)
+        if not node:
+            node = self._get_vpc_node(node_id)
+        return self._is_bare_metal_data(node)
+
+    @staticmethod
+    def _bare_metal_as_node(server):
+        """maps bare metal server data onto the instance data model used throughout this provider"""
+        server["status"] = BARE_METAL_STATUSES.get(server["status"], server["status"])
+        return server
+
+    def _list_bare_metal_servers(self):
+        result = self.ibm_vpc_client.list_bare_metal_servers().get_result()
+        servers = result["bare_metal_servers"]
+        while result.get("next"):
+            start = result["next"]["href"].split("start=")[1]
+            result = self.ibm_vpc_client.list_bare_metal_servers(start=start).get_result()
+            servers.extend(result["bare_metal_servers"])
+        return [self._bare_metal_as_node(server) for server in servers]
+
+    def _get_vpc_node(self, node_id, bare_metal=None):
+        """
+        returns node data of either a VSI or a bare metal server from the VPC api.
+        Args:
+            node_id(str): id of the node.
+            bare_metal(bool): whether the node is a bare metal server. if not specified, it's inferred from the node's cached
+                data or tags, and a node that isn't found as a VSI is looked up as a bare metal server.
+        """
+        if bare_metal is None:
+            with self.lock:
+                node = self.cached_nodes.get(node_id)
+                tagged = self.nodes_tags.get(node_id, {}).get(TAG_VPC_RESOURCE_TYPE) == BARE_METAL_SERVER
+            if node:
+                bare_metal = self._is_bare_metal_data(node)
+            elif tagged:
+                bare_metal = True
+
+        if bare_metal:
+            return self._bare_metal_as_node(self.ibm_vpc_client.get_bare_metal_server(node_id).get_result())
+
+        try:
+            return self.ibm_vpc_client.get_instance(node_id).get_result()
+        except ApiException as e:
+            if bare_metal is not None or e.code != 404:
+                raise e
+            try:
+                return self._bare_metal_as_node(self.ibm_vpc_client.get_bare_metal_server(node_id).get_result())
+            except ApiException as bare_metal_error:
+                if bare_metal_error.code == 404:
+                    raise e  # not found as either
+                raise bare_metal_error
+
+    def _create_bare_metal_server(self, name, base_config):
+        """
+        Creates a new bare metal server with the specified name, based on the provided base_config configuration dictionary
+        Args:
+            name(str): name of the server.
+            base_config(dict): specific node relevant data. node type segment of the cluster's config file, e.g. ray_worker_metal.
+        """
+
+        logger.info("Creating new bare metal server {}".format(name))
+
+        bare_metal_server_prototype = {}
+        bare_metal_server_prototype["name"] = name
+        bare_metal_server_prototype["initialization"] = {
+            "image": {"id": base_config["image_id"]},
+            "keys": [{"id": base_config["key_id"]}],
+        }
+        bare_metal_server_prototype["primary_network_interface"] = {
+            "name": "eth0",
+            "subnet": {"id": base_config["subnet_id"]},
+            "security_groups": [{"id": base_config["security_group_id"]}],
+        }
+        bare_metal_server_prototype["profile"] = {"name": base_config["bare_metal_profile_name"]}
+        bare_metal_server_prototype["zone"] = {"name": self.provider_config["zone_name"]}
+        bare_metal_server_prototype["resource_group"] = {"id": base_config["resource_group_id"]}
+        bare_metal_server_prototype["vpc"] = {"id": base_config["vpc_id"]}
+
+        try:
+            with self.lock:
+                resp = self.ibm_vpc_client.create_bare_metal_server(bare_metal_server_prototype)
+        except ApiException as e:
+            if e.code == 400 and "already exists" in e.message:
+                servers = self.ibm_vpc_client.list_bare_metal_servers(name=name).get_result()["bare_metal_servers"]
+                return self._bare_metal_as_node(servers[0]) if servers else None
+            elif e.code == 400 and "over quota" in e.message:
+                cli_logger.error(
+                    "Create bare metal server {} failed due to quota limit".format(name)
+                )
+            else:
+                cli_logger.error(
+                    "Create bare metal server {} failed with status code {}".format(
+                        name, str(e.code)
+                    )
+                )
+            raise e
+
+        logger.info("Bare metal server {} created successfully ".format(name))
+        return self._bare_metal_as_node(resp.result)
+
     def _get_instance_data(self, name):
         """Returns instance (node) information matching the specified name"""
 
@@ -431,12 +672,128 @@ class IBMVPCNodeProvider(NodeProvider):
             return instances_data["instances"][0]
         return None
 
-    def _create_instance(self, name, base_config):
+    def _placement_group(self, node_type, base_config):
+        """
+        returns the placement group nodes of node_type are created in, or None if `placement_group_strategy` isn't set in base_config.
+        reuses `placement_group_id` if specified, otherwise finds or creates a group shared by the cluster, or by node_type
+        if `placement_group_scope: node_type`.
+        Args:
+            node_type(str): ray user node type of the created nodes.
+            base_config(dict): specific node relevant data. node type segment of the cluster's config file, e.g. ray_head_default.
+        """
+        strategy = base_config.get("placement_group_strategy")
+        if not strategy and not base_config.get("placement_group_id"):
+            return None
+
+        if base_config.get("placement_group_id"):
+            return self.ibm_vpc_client.get_placement_group(base_config["placement_group_id"]).get_result()
+
+        if strategy not in PLACEMENT_STRATEGIES:
+            raise Exception(f"Invalid placement_group_strategy {strategy}, expected one of {PLACEMENT_STRATEGIES}")
+
+        name = self._placement_group_name(
+            node_type if base_config.get("placement_group_scope") == "node_type" else None
+        )
+
+        # the group is looked up and created under its own lock, as polling for it to become stable may take a while
+        with self.lock:
+            if name in self.placement_groups:
+                return self.placement_groups[name]
+            creation_lock = self.placement_group_locks.setdefault(name, threading.Lock())
+
+        with creation_lock:
+            with self.lock:
+                if name in self.placement_groups:
+                    return self.placement_groups[name]
+
+            result = self.ibm_vpc_client.list_placement_groups().get_result()
+            groups = result["placement_groups"]
+            while result.get("next"):
+                start = result["next"]["href"].split("start=")[1]
+                result = self.ibm_vpc_client.list_placement_groups(start=start).get_result()
+                groups.extend(result["placement_groups"])
+
+            group = next((g for g in groups if g["name"] == name), None)
+            if group:
+                if group["strategy"] != strategy:
+                    logger.warning(f"reusing placement group {name} with strategy {group['strategy']} instead of {strategy}")
+            else:
+                logger.info(f"Creating placement group {name} with strategy {strategy}")
+                group = self.ibm_vpc_client.create_placement_group(
+                    strategy, name=name, resource_group={"id": base_config["resource_group_id"]}
+                ).get_result()
+
+            # instances can only be created in a stable placement group
+            deadline = time.time() + PLACEMENT_GROUP_READY_TIMEOUT
+            while group["lifecycle_state"] != "stable":
+                if time.time() > deadline:
+                    raise Exception(f"placement group {name} not stable after {PLACEMENT_GROUP_READY_TIMEOUT} seconds")
+                time.sleep(1)
+                group = self.ibm_vpc_client.get_placement_group(group["id"]).get_result()
+
+            with self.lock:
+                self.placement_groups[name] = group
+            return group
+
+    def _placement_group_deleted(self, group):
+        """
+        returns True if group no longer exists, e.g. as it was garbage collected after its node type scaled to zero.
+        a deleted group is dropped from self.placement_groups, so it's recreated on the next lookup.
+        """
+        try:
+            state = self.ibm_vpc_client.get_placement_group(group["id"]).get_result()["lifecycle_state"]
+            if state != "deleting":
+                return False
+        except ApiException as e:
+            if e.code != 404:
+                raise e
+        self._uncache_placement_group(group["id"])
+        return True
+
+    def _uncache_placement_group(self, group_id):
+        """drops the placement group group_id from self.placement_groups"""
+        with self.lock:
+            for name, group in list(self.placement_groups.items()):
+                if group["id"] == group_id:
+                    self.placement_groups.pop(name)
+
+    def _recyclable_prefix(self):
+        """
+        returns the name prefix of resources created by this package for the cluster: ray-recyclable-{cluster_name}-{digest}-
+        the digest of the full cluster name tells apart clusters whose (truncated) names are prefixes of each other.
+        """
+        cluster_name = re.sub("[^-a-z0-9]", "-", self.cluster_name.lower())[:RECYCLABLE_CLUSTER_NAME_LEN].strip("-")
+        digest = hashlib.sha1(self.cluster_name.encode()).hexdigest()[:6]
+        return f"{RAY_RECYCLABLE}-{cluster_name}-{digest}-"
+
+    def _placement_group_name(self, node_type=None):
+        """returns the name of the placement group created for the cluster, or for node_type if specified"""
+        name = f"{self.recyclable_prefix}pg"
+        if node_type:
+            name = f"{name}-{node_type}"
+        return re.sub("[^-a-z0-9]", "-", name.lower())[:INSTANCE_NAME_MAX_LEN - 1].rstrip("-")
+
+    def placement_topology(self)-> Dict[str, Dict[str, Any]]:
+        """returns the effective placement of the cluster's nodes: {placement_group_id: {"strategy": str, "nodes": [node_id]}}.
+        nodes created outside a placement group are listed under None."""
+        topology = {}
+        with self.lock:
+            for node_id, tags in self.nodes_tags.items():
+                group = topology.setdefault(
+                    tags.get(TAG_PLACEMENT_GROUP), {"strategy": tags.get(TAG_PLACEMENT_STRATEGY), "nodes": []}
+                )
+                group["nodes"].append(node_id)
+        return topology
+
+    def _create_instance(self, name, base_config, golden_image=None, boot_volume_id=None, placement_group=None):
         """
         Creates a new VM instance with the specified name, based on the provided base_config configuration dictionary 
         Args:
             name(str): name of the instance.
             base_config(dict): specific node relevant data. node type segment of the cluster's config file, e.g. ray_head_default. 
+            golden_image(dict): golden image record to boot from instead of image_id, if specified.
+            boot_volume_id(str): id of an existing, detached boot volume to boot from, if specified.
+            placement_group(dict): placement group to create the instance in, if specified.
         """
 
         logger.info("Creating new VM instance {}".format(name))
@@ -450,16 +807,18 @@ class IBMVPCNodeProvider(NodeProvider):
         }
 
         boot_volume_profile = {
-            "capacity": base_config.get("boot_volume_capacity", 100),
-            "name": f"boot-volume-{uuid4().hex[:4]}",
+            "capacity": base_config.get("boot_volume_capacity", BOOT_VOLUME_CAPACITY_DEFAULT),
+            "name": f"{self.recyclable_prefix}boot-{uuid4().hex[:8]}",
             "profile": {
                 "name": base_config.get("volume_tier_name", VOLUME_TIER_NAME_DEFAULT)
             },
         }
+        if golden_image:
+            boot_volume_profile["source_snapshot"] = {"id": golden_image["snapshot_id"]}
 
         boot_volume_attachment = {
             "delete_volume_on_instance_delete": True,
-            "volume": boot_volume_profile,
+            "volume": {"id": boot_volume_id} if boot_volume_id else boot_volume_profile,
         }
 
         key_identity_model = {"id": base_config["key_id"]}
@@ -471,11 +830,14 @@ class IBMVPCNodeProvider(NodeProvider):
         instance_prototype["profile"] = {"name": profile_name}
         instance_prototype["resource_group"] = {"id": base_config["resource_group_id"]}
         instance_prototype["vpc"] = {"id": base_config["vpc_id"]}
-        instance_prototype["image"] = {"id": base_config["image_id"]}
+        if not golden_image and not boot_volume_id:
+            instance_prototype["image"] = {"id": base_config["image_id"]}
 
         instance_prototype["zone"] = {"name": self.provider_config["zone_name"]}
         instance_prototype["boot_volume_attachment"] = boot_volume_attachment
         instance_prototype["primary_network_interface"] = primary_network_interface
+        if placement_group:
+            instance_prototype["placement_target"] = {"id": placement_group["id"]}
 
         try:
             with self.lock:
@@ -509,7 +871,7 @@ class IBMVPCNodeProvider(NodeProvider):
                 if ip["address"] == base_config["head_ip"]:
                     return ip
 
-        floating_ip_name = "{}-{}".format(RAY_RECYCLABLE, uuid4().hex[:4])
+        floating_ip_name = "{}fip-{}".format(self.recyclable_prefix, uuid4().hex[:4])
         # create a new floating ip 
         logger.info("Creating floating IP {}".format(floating_ip_name))
         floating_ip_prototype = {}
@@ -561,13 +923,17 @@ class IBMVPCNodeProvider(NodeProvider):
             TAG_RAY_CLUSTER_NAME: self.cluster_name,
             TAG_RAY_NODE_KIND: tags[TAG_RAY_NODE_KIND],
         }
-
         nodes = []
         for node_id in self.nodes_tags:
             try:
                 node_tags = self.nodes_tags[node_id]
+                # avoid reusing nodes of another node type, e.g. a bare metal server for a VSI node type.
+                # nodes whose tags only come from listing lack their node type, and are reused as before.
+                node_type = node_tags.get(TAG_RAY_USER_NODE_TYPE)
+                if node_type and tags.get(TAG_RAY_USER_NODE_TYPE) and node_type != tags[TAG_RAY_USER_NODE_TYPE]:
+                    continue
                 if all(item in node_tags.items() for item in filter.items()):
-                    node = self.ibm_vpc_client.get_instance(node_id).result
+                    node = self._get_vpc_node(node_id)
                     state = node["status"]
                     if state in ["stopped", "stopping"]:
                         nodes.append(node)
@@ -578,7 +944,7 @@ class IBMVPCNodeProvider(NodeProvider):
                 raise e
         return nodes
 
-    def _create_node(self, base_config, tags):
+    def _create_node(self, base_config, tags, golden_image=None, placement_group=None, fallback_index=None):
         """
         returns dict {instance_id:instance_data} of newly created node. updates tags cache.
         creates a node in the following format: ray-{cluster_name}-{node_type}-{uuid}
@@ -586,6 +952,9 @@ class IBMVPCNodeProvider(NodeProvider):
         Args:
             base_config(dict): specific node relevant data. node type segment of the cluster's config file, e.g. ray_head_default.
             tags(dict): set of conditions nodes will be filtered by.
+            golden_image(dict): golden image record the node will boot from, if specified.
+            placement_group(dict): placement group the node will be created in, if specified.
+            fallback_index(int): index into `fallback_instance_profile_names` of the profile in base_config, None for the primary profile.
         """
         
         name_tag = tags[TAG_RAY_NODE_NAME]
@@ -605,16 +974,65 @@ class IBMVPCNodeProvider(NodeProvider):
             name_tag=name_tag, uuid=uuid4().hex[:INSTANCE_NAME_UUID_LEN]
         )
 
+        bare_metal = bool(base_config.get("bare_metal_profile_name"))
+
+        # reuse a pooled boot volume, unless booting from a golden image
+        pool_key = None
+        pool_entry = None
+        capacity = base_config.get("boot_volume_capacity", BOOT_VOLUME_CAPACITY_DEFAULT)
+        if base_config.get("boot_volume_pool") and not golden_image and not bare_metal:
+            pool_key = BootVolumePool.key(
+                tags.get(TAG_RAY_USER_NODE_TYPE),
+                base_config.get("volume_tier_name", VOLUME_TIER_NAME_DEFAULT),
+                capacity,
+                base_config["image_id"],
+            )
+            pool_entry = self.volume_pool.acquire(pool_key)
+        boot_volume_id = pool_entry["id"] if pool_entry else None
+
         # create instance in vpc
-        instance = self._create_instance(name, base_config)
+        try:
+            if bare_metal:
+                instance = self._create_bare_metal_server(name, base_config)
+            else:
+                instance = self._create_instance(name, base_config, golden_image, boot_volume_id, placement_group)
+        except ApiException as e:
+            retry = False
+            if pool_entry:
+                # only a volume the create failed on is deleted. otherwise, e.g. on quota or transient errors, it's kept.
+                if "volume" in str(e.message).lower():
+                    logger.warning(f"failed to boot {name} from pooled volume {boot_volume_id}, provisioning a new one")
+                    self.volume_pool.discard(boot_volume_id)
+                    retry = True
+                else:
+                    self.volume_pool.restore(pool_entry)
+            if placement_group and self._placement_group_deleted(placement_group):
+                logger.warning(f"placement group {placement_group['name']} was deleted, recreating it")
+                placement_group = self._placement_group(tags.get(TAG_RAY_USER_NODE_TYPE), base_config)
+                tags = dict(tags, **{TAG_PLACEMENT_GROUP: placement_group["id"]})
+                retry = True
+            if not retry:
+                raise
+            instance = self._create_instance(name, base_config, golden_image, placement_group=placement_group)
+
+        if pool_key:
+            self.volume_pool.register(instance["id"], pool_key, capacity, base_config["boot_volume_pool"])
 
-        # record creation time. used to discover hanging nodes.
+        # record creation time and schedule the pending timeout. used to discover hanging nodes.
         with self.lock:
             self.pending_nodes[instance["id"]] = time.time()   
+        self.profile_fallbacks.created(instance["id"], tags.get(TAG_RAY_USER_NODE_TYPE), fallback_index)
+        self.pending_deadlines.schedule(
+            instance["id"],
+            base_config.get("pending_timeout", BARE_METAL_PENDING_TIMEOUT if bare_metal else PENDING_TIMEOUT),
+        )
 
         tags[TAG_RAY_CLUSTER_NAME] = self.cluster_name
         tags[TAG_RAY_NODE_NAME] = name
-        self.set_node_tags(instance["id"], tags)
+        if self.cloud_tags:
+            self.cloud_tags.register(instance["id"], instance["crn"])
+        node_tags = dict(tags, **{TAG_VPC_RESOURCE_TYPE: BARE_METAL_SERVER}) if bare_metal else tags
+        self.set_node_tags(instance["id"], node_tags)
 
         # currently always creating public ip for head node
         if self._get_node_type(name) == NODE_KIND_HEAD:
@@ -655,7 +1073,10 @@ class IBMVPCNodeProvider(NodeProvider):
 
             for node in stopped_nodes:
                 logger.info(f"Starting instance {node['id']}")
-                self.ibm_vpc_client.create_instance_action(node["id"], "start")
+                if self._is_bare_metal_data(node):
+                    self.ibm_vpc_client.start_bare_metal_server(node["id"])
+                else:
+                    self.ibm_vpc_client.create_instance_action(node["id"], "start")
 
             time.sleep(1)
 
@@ -669,11 +1090,49 @@ class IBMVPCNodeProvider(NodeProvider):
 
         created_nodes_dict = {}
 
+        node_type = tags.get(TAG_RAY_USER_NODE_TYPE)
+        base_config, fallback_index = self.profile_fallbacks.node_config(node_type, base_config)
+        self.garbage_collector.add_scope(base_config)
+
+        # bare metal servers are provisioned through their own api, which supports neither golden images nor placement groups
+        bare_metal = bool(base_config.get("bare_metal_profile_name"))
+        if bare_metal and tags[TAG_RAY_NODE_KIND] != NODE_KIND_WORKER:
+            raise Exception("bare_metal_profile_name is only supported for worker node types")
+        if bare_metal:
+            self.bare_metal = True
+
+        # boot new workers from the golden image of their node type, if one is ready.
+        golden_image = None
+        if count and base_config.get("golden_image") and tags[TAG_RAY_NODE_KIND] == NODE_KIND_WORKER and not bare_metal:
+            self.golden_images.enable(node_type, base_config)
+            golden_image = self.golden_images.lookup(node_type)
+            if golden_image:
+                cli_logger.print(f"Booting {node_type} nodes from golden snapshot {golden_image['snapshot_id']}")
+                # marks the nodes as set up, so ray skips setup_commands on them
+                tags = dict(tags, **GoldenImages.node_tags(golden_image))
+
+        # place new nodes in the placement group of their node type, recording membership in their tags
+        placement_group = self._placement_group(node_type, base_config) if count and not bare_metal else None
+        if placement_group:
+            cli_logger.print(
+                f"Creating {node_type} nodes in placement group {placement_group['name']} "
+                f"with strategy {placement_group['strategy']}"
+            )
+            tags = dict(
+                tags,
+                **{
+                    TAG_PLACEMENT_GROUP: placement_group["id"],
+                    TAG_PLACEMENT_STRATEGY: placement_group["strategy"],
+                },
+            )
+
         # create multiple instances concurrently
         if count:
             with cf.ThreadPoolExecutor(count) as ex:
                 for i in range(count):
-                    futures.append(ex.submit(self._create_node, base_config, tags))
+                    futures.append(
+                        ex.submit(self._create_node, base_config, tags, golden_image, placement_group, fallback_index)
+                    )
 
             for future in cf.as_completed(futures):
                 created_node = future.result()
@@ -682,6 +1141,9 @@ class IBMVPCNodeProvider(NodeProvider):
         all_created_nodes = stopped_nodes_dict
         all_created_nodes.update(created_nodes_dict)
 
+        if placement_group:
+            logger.info(f"placement topology: {self.placement_topology()}")
+
         # this sleep is required due to race condition with non_terminated_nodes
         # called in separate thread by autoscaler. not a lost as anyway the vsi
         # operating system takes time to start. can be removed after
@@ -701,16 +1163,29 @@ class IBMVPCNodeProvider(NodeProvider):
             try:  
                 node = self._get_node(node_id)
                 floating_ips = node.get("floating_ips", [])
-            except Exception:
-                pass
 
-            self.ibm_vpc_client.delete_instance(node_id)
+                # keep the boot volume for reuse by a future node, if the node's pool has room for it
+                self.volume_pool.release(node)
+            except Exception as e:
+                logger.warning(
+                    f"failed to get {node_id} before deleting it, "
+                    f"its floating ips are left for the garbage collector: {e}"
+                )
+
+            if self._is_bare_metal(node_id):
+                self.ibm_vpc_client.delete_bare_metal_server(node_id)
+            else:
+                self.ibm_vpc_client.delete_instance(node_id)
 
             with self.lock:
                 # drop node tags
                 self.nodes_tags.pop(node_id, None)
-                self.pending_nodes.pop(node["id"], None)
+                self.pending_nodes.pop(node_id, None)
+                self.profile_fallbacks.forget(node_id)
+                self.pending_deadlines.cancel(node_id)
                 self.deleted_nodes.append(node_id)
+                if self.cloud_tags:
+                    self.cloud_tags.forget(node_id)
                 self.cached_nodes.pop(node_id, None)
 
                 # calling set_node_tags with None will dump self.nodes_tags cache to file
@@ -726,6 +1201,72 @@ class IBMVPCNodeProvider(NodeProvider):
             else:
                 raise e
 
+    def _pending_node_running(self, node_id):
+        """
+        drops a node that reached running from the pending nodes, see ProfileFallbacks.running.
+        """
+        with self.lock:
+            self.pending_nodes.pop(node_id, None)
+            self.pending_deadlines.cancel(node_id)
+        self.profile_fallbacks.running(node_id)
+
+    def _pending_node_expired(self, node_id):
+        """
+        called by self.pending_deadlines once a node's pending timeout passed. deletes the node unless it's running by now.
+        if handling fails, e.g. due to an api error, it's retried after PENDING_RETRY_INTERVAL seconds. 
+        """
+        try:
+            self._expire_pending_node(node_id)
+        except Exception as e:
+            with self.lock:
+                if node_id not in self.pending_nodes:
+                    return
+            logger.warning(
+                f"failed to handle pending timeout of {node_id}, retrying in {PENDING_RETRY_INTERVAL} seconds: {e}"
+            )
+            self.pending_deadlines.schedule(node_id, PENDING_RETRY_INTERVAL)
+
+    def _expire_pending_node(self, node_id):
+        """
+        deletes node_id unless it reached running. 
+        if its node type specifies `fallback_instance_profile_names` and the node was created with the profile currently in use,
+        subsequent nodes of that type use the next profile.
+        """
+        with self.lock:
+            if node_id not in self.pending_nodes:
+                return
+            pending_time = time.time() - self.pending_nodes[node_id]
+
+        try:
+            node = self._get_vpc_node(node_id)
+        except ApiException as e:
+            if e.code == 404:
+                with self.lock:
+                    self.pending_nodes.pop(node_id, None)
+                self.profile_fallbacks.forget(node_id)
+                return
+            raise e
+
+        if node["status"] == "running":
+            self._pending_node_running(node_id)
+            return
+
+        logger.error(
+            f"pending timeout reached after {int(pending_time)} seconds, "
+            f"deleting instance {node_id} in status {node['status']}"
+        )
+        self.profile_fallbacks.expired(node_id)
+        self._delete_node(node_id)  # we won't try to restart a failed node
+
+    def collect_garbage(self, dry_run=False)-> Dict[str, List[Any]]:
+        """
+        deletes floating ips, boot volumes and placement groups leaked by the cluster, and drops tags of nodes that no longer exist.
+        returns a report of the leaked resources, see GarbageCollector.
+        Args:
+            dry_run(bool): only report leaked resources, without deleting them.
+        """
+        return self.garbage_collector.sweep(dry_run)
+
     def terminate_nodes(self, node_ids)-> Optional[Dict[str, Any]]:
 
         if not node_ids:
@@ -755,7 +1296,10 @@ class IBMVPCNodeProvider(NodeProvider):
                     "under `provider` in the cluster configuration"
                 )
 
-                self.ibm_vpc_client.create_instance_action(node_id, "stop")
+                if self._is_bare_metal(node_id):
+                    self.ibm_vpc_client.stop_bare_metal_server(node_id, "soft")
+                else:
+                    self.ibm_vpc_client.create_instance_action(node_id, "stop")
             else:
                 cli_logger.print(f"Terminating instance {node_id}")
                 self._delete_node(node_id)
@@ -774,7 +1318,7 @@ class IBMVPCNodeProvider(NodeProvider):
             return self.cached_nodes[node_id]
 
         try:
-            node = self.ibm_vpc_client.get_instance(node_id).get_result()
+            node = self._get_vpc_node(node_id)
             with self.lock:
                 self.cached_nodes[node_id] = node
             return node
@@ -815,5 +1359,5 @@ def _configure_logger():
     console_output_handler.setFormatter(file_formatter)
     console_output_handler.setLevel(logging.INFO)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_output_handler)    
\ No newline at end of file
+    package_logger.addHandler(file_handler)
+    package_logger.addHandler(console_output_handler)    
\ No newline at end of file
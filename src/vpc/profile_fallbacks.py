@@ -0,0 +1,101 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FALLBACK_COOLDOWN = 1800  # seconds after its last pending timeout, until a node type retries its primary profile.
+
+
+class ProfileFallbacks:
+    """Instance profiles node types are created with, according to their `fallback_instance_profile_names`.
+
+    A node type moves on to its next fallback profile when a node created with the profile currently in use
+    times out pending. It keeps using that profile while its nodes come up, and moves back to a more preferred
+    profile once a node created with one reaches running, or PROFILE_FALLBACK_COOLDOWN seconds after its last
+    timeout.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fallbacks = {}  # {node_type: (index into fallback_instance_profile_names, time of the last timeout)}
+        self.nodes = {}  # {node_id: (node_type, fallback index or None)} the profile pending nodes were created with.
+
+    def _index(self, node_type):
+        """returns the fallback index currently in use by node_type, None for its primary profile. requires self.lock."""
+        fallback = self.fallbacks.get(node_type)
+        if not fallback:
+            return None
+        index, timed_out_at = fallback
+        if time.time() - timed_out_at > PROFILE_FALLBACK_COOLDOWN:
+            self.fallbacks.pop(node_type)
+            return None
+        return index
+
+    def node_config(self, node_type, base_config):
+        """
+        returns (base_config, fallback index) with the instance profile of node_type replaced by its current fallback profile.
+        the index is None if the primary profile is used.
+        Args:
+            node_type(str): ray user node type of the created nodes.
+            base_config(dict): node_config segment of node_type within the cluster's config file.
+        """
+        fallbacks = base_config.get("fallback_instance_profile_names")
+        with self.lock:
+            index = self._index(node_type)
+            if not fallbacks or index is None:
+                return base_config, None
+            if index > len(fallbacks) - 1:
+                # out of fallbacks, keep using the last one
+                index = len(fallbacks) - 1
+                self.fallbacks[node_type] = (index, self.fallbacks[node_type][1])
+
+        profile_name = fallbacks[index]
+        logger.info(f"creating {node_type} nodes with fallback profile {profile_name}")
+        return dict(base_config, instance_profile_name=profile_name), index
+
+    def created(self, node_id, node_type, index):
+        """records the profile a pending node was created with, see node_config"""
+        with self.lock:
+            self.nodes[node_id] = (node_type, index)
+
+    def running(self, node_id):
+        """a pending node reached running. if it was created with a profile preferred over the current one, its node type
+        moves back to that profile."""
+        with self.lock:
+            node_type, created_index = self.nodes.pop(node_id, (None, None))
+            index = self._index(node_type)
+            if index is None or (created_index is not None and created_index >= index):
+                return
+            if created_index is None:
+                self.fallbacks.pop(node_type)
+            else:
+                self.fallbacks[node_type] = (created_index, self.fallbacks[node_type][1])
+
+    def expired(self, node_id):
+        """a pending node timed out. if it was created with the profile currently in use, its node type moves on to the
+        next fallback profile."""
+        with self.lock:
+            node_type, created_index = self.nodes.pop(node_id, (None, None))
+            if node_type and self._index(node_type) == created_index:
+                self.fallbacks[node_type] = (0 if created_index is None else created_index + 1, time.time())
+
+    def forget(self, node_id):
+        with self.lock:
+            self.nodes.pop(node_id, None)
@@ -0,0 +1,148 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+from ibm_cloud_sdk_core.token_managers.iam_token_manager import IAMTokenManager
+
+logger = logging.getLogger(__name__)
+
+IAM_TOKEN_CACHE = ".ray-vpc-iam-tokens"  # host wide IAM token cache, shared by all processes of the same user.
+REFRESH_FRACTION = 0.2  # a cached token is reused until less than this fraction of its lifetime remains.
+BACKGROUND_REFRESH_FRACTION = 0.25  # background refresh kicks in slightly before tokens stop being reused.
+REFRESH_RETRY_INTERVAL = 30  # seconds to wait before retrying a failed background refresh.
+
+_refreshers = {}  # {cache_key: thread}. a single background refresher per api key per process.
+_refreshers_lock = threading.Lock()
+
+
+def _is_fresh(token, fraction):
+    """returns True if more than `fraction` of the token's lifetime is still ahead of it."""
+    if not token:
+        return False
+    expires_in = token.get("expires_in", 0)
+    expiration = token.get("expiration", 0)
+    return time.time() < expiration - fraction * expires_in
+
+
+class SharedIAMTokenManager(IAMTokenManager):
+    """IAM token manager backed by a file cache shared between the processes of a host.
+
+    Ray instantiates the node provider in several processes (`ray up`, the monitor, cli helpers),
+    each of which would otherwise exchange the api key for a token before its first VPC call.
+    Tokens are stored in ~/.ray-vpc-iam-tokens keyed by a digest of the api key and IAM url,
+    guarded by an flock on a sibling lock file, so only one process performs the exchange.
+    """
+
+    def __init__(self, apikey, *, url=None, cache_path=None, **kwargs):
+        super().__init__(apikey, url=url, **kwargs)
+        self.cache_path = Path(cache_path) if cache_path else Path.home() / IAM_TOKEN_CACHE
+        self.lock_path = self.cache_path.with_name(self.cache_path.name + ".lock")
+        self.cache_key = hashlib.sha256(f"{self.url}:{apikey}".encode()).hexdigest()
+
+    @contextmanager
+    def _file_lock(self, exclusive):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read_cache(self):
+        """returns all cached tokens. a missing or corrupted cache file is treated as empty."""
+        try:
+            return json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, tokens):
+        """atomically replaces the cache file, readable by the current user only."""
+        tmp_path = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def cached_token(self):
+        """returns the token response cached for this api key, or None."""
+        with self._file_lock(exclusive=False):
+            return self._read_cache().get(self.cache_key)
+
+    def request_token(self, fraction=REFRESH_FRACTION):
+        """returns a token response, performing an IAM exchange only if no sufficiently fresh token is cached.
+        Args:
+            fraction(float): minimal remaining fraction of lifetime for a cached token to be reused.
+        """
+        token = self.cached_token()
+        if _is_fresh(token, fraction):
+            return token
+
+        with self._file_lock(exclusive=True):
+            # another process may have refreshed the token while we waited for the lock
+            tokens = self._read_cache()
+            token = tokens.get(self.cache_key)
+            if _is_fresh(token, fraction):
+                return token
+
+            logger.debug("requesting a new IAM token")
+            token = super().request_token()
+            tokens = {k: v for k, v in tokens.items() if _is_fresh(v, 0)}  # drop expired tokens of other keys
+            tokens[self.cache_key] = token
+            self._write_cache(tokens)
+            return token
+
+    def start_background_refresh(self):
+        """starts a daemon thread refreshing the cached token before it stops being reused. one thread per api key."""
+        with _refreshers_lock:
+            thread = _refreshers.get(self.cache_key)
+            if thread and thread.is_alive():
+                return
+            thread = threading.Thread(
+                target=self._refresh_loop, name="ray-vpc-iam-token-refresh", daemon=True
+            )
+            _refreshers[self.cache_key] = thread
+            thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                token = self.request_token(fraction=BACKGROUND_REFRESH_FRACTION)
+                refresh_at = token["expiration"] - BACKGROUND_REFRESH_FRACTION * token["expires_in"]
+                time.sleep(max(refresh_at - time.time(), 1))
+            except Exception as e:
+                logger.warning(f"background IAM token refresh failed: {e}")
+                time.sleep(REFRESH_RETRY_INTERVAL)
+
+
+class SharedIAMAuthenticator(IAMAuthenticator):
+    """IAMAuthenticator obtaining its tokens through SharedIAMTokenManager."""
+
+    def __init__(self, apikey, url=None, cache_path=None, background_refresh=True):
+        super().__init__(apikey, url=url)
+        self.token_manager = SharedIAMTokenManager(apikey, url=url, cache_path=cache_path)
+        if background_refresh:
+            self.token_manager.start_background_refresh()
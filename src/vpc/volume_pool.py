@@ -0,0 +1,268 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from ibm_cloud_sdk_core import ApiException
+
+logger = logging.getLogger(__name__)
+
+VOLUME_POOL = ".ray-vpc-volume-pool"  # local record of the pooled boot volumes of each cluster.
+POOL_MAX_SIZE_DEFAULT = 2  # max number of pooled volumes per pool key.
+POOL_TTL_MINUTES_DEFAULT = 60  # pooled volumes unused for this long are deleted.
+POOL_MAX_GB_DEFAULT = 1000  # max total capacity of pooled volumes of a cluster.
+POOL_REAP_INTERVAL = 60  # seconds between sweeps of expired volumes.
+POOL_PRUNE_INTERVAL = 600  # seconds between sweeps of registered nodes that were deleted by other processes.
+
+
+def pooled_volume_name(name_prefix, expires_at):
+    """returns the name of a pooled volume. it records the volume's expiry, so any process can tell it's still pooled"""
+    return f"{name_prefix}pool-{int(expires_at)}-{uuid4().hex[:4]}"
+
+
+def pooled_volume_expiry(name_prefix, name):
+    """returns the expiry time recorded in the name of a pooled volume, or None if name isn't a pooled volume's name"""
+    match = re.match(f"^{re.escape(name_prefix)}pool-([0-9]+)-", name)
+    return int(match.group(1)) if match else None
+
+
+class BootVolumePool:
+    """Pool of detached boot volumes, reused by new instances instead of provisioning fresh volumes.
+
+    Enabled per node type via `boot_volume_pool` in its node_config. When a pooled node is deleted,
+    its boot volume is kept (delete_volume_on_instance_delete is turned off) and added to the pool,
+    unless the pool of its key is full or the total pooled capacity would exceed the cluster cap.
+    New nodes with the same key boot from a pooled volume, skipping volume provisioning.
+    Volumes are keyed by node type, volume profile, capacity and image, and are deleted once
+    their TTL expires. Pooled volumes are renamed to record their expiry (see pooled_volume_name), which
+    garbage collectors of other processes, lacking this process's records, respect.
+
+    Records are kept in ~/.ray-vpc-volume-pool:
+    {cluster_name: {"volumes": [entry], "nodes": {node_id: {"key", "capacity", "ttl_minutes", "max_size"}}}}
+    """
+
+    def __init__(self, ibm_vpc_client, cluster_name, name_prefix, max_total_gb=POOL_MAX_GB_DEFAULT):
+        """
+        Args:
+            ibm_vpc_client(VpcV1): VPC api client.
+            cluster_name(str): value of cluster_name within the cluster's config file.
+            name_prefix(str): name prefix of resources created by this package for the cluster.
+            max_total_gb(int): cap on the total capacity of pooled volumes.
+        """
+        self.ibm_vpc_client = ibm_vpc_client
+        self.cluster_name = cluster_name
+        self.name_prefix = name_prefix
+        self.max_total_gb = max_total_gb
+        self.lock = threading.RLock()
+        self.reaper = None
+        self.pruned_at = 0  # last time registrations of deleted nodes were pruned.
+
+        self.pool_file = Path.home() / VOLUME_POOL
+        self.volumes = []  # [{"id", "key", "capacity", "expires_at"}] pooled volumes, oldest first.
+        self.nodes = {}  # {node_id: pool settings} of nodes whose volume is returned to the pool on delete.
+        if self.pool_file.is_file():
+            cluster_pool = json.loads(self.pool_file.read_text()).get(self.cluster_name, {})
+            self.volumes = cluster_pool.get("volumes", [])
+            self.nodes = cluster_pool.get("nodes", {})
+
+        if self.volumes or self.nodes:
+            self._start_reaper()
+
+    def _dump(self):
+        """dumps in-memory records to the local file"""
+        all_pools = {}
+        if self.pool_file.is_file():
+            all_pools = json.loads(self.pool_file.read_text())
+        all_pools[self.cluster_name] = {"volumes": self.volumes, "nodes": self.nodes}
+        self.pool_file.write_text(json.dumps(all_pools))
+
+    @staticmethod
+    def key(node_type, profile, capacity, image_id):
+        """returns the pool key of volumes interchangeable between nodes with the specified attributes"""
+        return f"{node_type}/{profile}/{capacity}/{image_id}"
+
+    def register(self, node_id, key, capacity, pool_config):
+        """marks node_id's boot volume to be returned to the pool of key when the node is deleted.
+        Args:
+            node_id(str): id of the node.
+            key(str): pool key, see BootVolumePool.key.
+            capacity(int): capacity in GB of the node's boot volume.
+            pool_config(dict): `boot_volume_pool` segment of the node's node_config.
+        """
+        pool_config = pool_config if isinstance(pool_config, dict) else {}
+        with self.lock:
+            self.nodes[node_id] = {
+                "key": key,
+                "capacity": capacity,
+                "max_size": pool_config.get("max_size", POOL_MAX_SIZE_DEFAULT),
+                "ttl_minutes": pool_config.get("ttl_minutes", POOL_TTL_MINUTES_DEFAULT),
+            }
+            self._dump()
+        self._start_reaper()
+
+    def acquire(self, key):
+        """returns the pool entry {"id", "key", "capacity", "expires_at"} of an available volume of key, removing it from
+        the pool, or None. volumes still detaching from their deleted instance are skipped and left in the pool."""
+        with self.lock:
+            candidates = [v for v in self.volumes if v["key"] == key]
+
+        for entry in candidates:
+            with self.lock:
+                if entry not in self.volumes:
+                    continue  # taken by a concurrent create
+                self.volumes.remove(entry)
+                self._dump()
+
+            try:
+                volume = self.ibm_vpc_client.get_volume(entry["id"]).get_result()
+            except ApiException as e:
+                if e.code == 404:
+                    continue
+                self.restore(entry)
+                raise e
+
+            if volume["status"] == "available" and not volume.get("volume_attachments"):
+                logger.info(f"reusing pooled boot volume {entry['id']}")
+                return entry
+
+            self.restore(entry)
+        return None
+
+    def restore(self, entry):
+        """returns an entry taken by acquire to the pool, e.g. when its volume wasn't used after all"""
+        with self.lock:
+            self.volumes.append(entry)
+            self._dump()
+
+    def release(self, node):
+        """keeps the boot volume of node, which is about to be deleted, for the pool. returns True if it was kept.
+        Args:
+            node(dict): extensive data of the node.
+        """
+        with self.lock:
+            settings = self.nodes.pop(node["id"], None)
+            if not settings:
+                return False
+            self._dump()
+
+            pooled = [v for v in self.volumes if v["key"] == settings["key"]]
+            pooled_gb = sum(v["capacity"] for v in self.volumes)
+            if len(pooled) >= settings["max_size"] or pooled_gb + settings["capacity"] > self.max_total_gb:
+                logger.debug(f"pool {settings['key']} is full, deleting boot volume of {node['id']}")
+                return False
+
+        attachment = node["boot_volume_attachment"]
+        volume_id = attachment["volume"]["id"]
+        expires_at = time.time() + settings["ttl_minutes"] * 60
+        try:
+            self.ibm_vpc_client.update_volume(volume_id, {"name": pooled_volume_name(self.name_prefix, expires_at)})
+            self.ibm_vpc_client.update_instance_volume_attachment(
+                node["id"], attachment["id"], {"delete_volume_on_instance_delete": False}
+            )
+        except ApiException as e:
+            logger.warning(f"failed to keep boot volume of {node['id']} for the pool: {e}")
+            return False
+
+        with self.lock:
+            self.volumes.append(
+                {
+                    "id": volume_id,
+                    "key": settings["key"],
+                    "capacity": settings["capacity"],
+                    "expires_at": expires_at,
+                }
+            )
+            self._dump()
+        logger.info(f"boot volume {volume_id} of {node['id']} returned to the pool")
+        self._start_reaper()
+        return True
+
+    def discard(self, volume_id):
+        """deletes a volume that was taken from the pool. returns False if the deletion failed."""
+        try:
+            self.ibm_vpc_client.delete_volume(volume_id)
+        except ApiException as e:
+            if e.code != 404:
+                logger.warning(f"failed to delete pooled boot volume {volume_id}: {e}")
+                return False
+        return True
+
+    def _start_reaper(self):
+        with self.lock:
+            if self.reaper and self.reaper.is_alive():
+                return
+            self.reaper = threading.Thread(target=self._reap_loop, name="ray-vpc-volume-pool", daemon=True)
+            self.reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(POOL_REAP_INTERVAL)
+            try:
+                self.reap()
+            except Exception as e:
+                logger.warning(f"failed to reap pooled boot volumes: {e}")
+            with self.lock:
+                if not self.volumes and not self.nodes:
+                    self.reaper = None
+                    return
+
+    def reap(self):
+        """deletes pooled volumes whose TTL expired, and every POOL_PRUNE_INTERVAL drops registrations of deleted nodes"""
+        now = time.time()
+        if now - self.pruned_at > POOL_PRUNE_INTERVAL:
+            self._prune_nodes()
+            self.pruned_at = now
+
+        with self.lock:
+            expired = [v for v in self.volumes if v["expires_at"] < now]
+            for entry in expired:
+                self.volumes.remove(entry)
+            if expired:
+                self._dump()
+
+        for entry in expired:
+            logger.info(f"pooled boot volume {entry['id']} expired, deleting it")
+            if not self.discard(entry["id"]):
+                # e.g. still detaching. retried on the next sweep.
+                self.restore(entry)
+
+    def _prune_nodes(self):
+        """drops registrations of nodes deleted without releasing their volume, e.g. by `ray down` from another machine"""
+        with self.lock:
+            registered = set(self.nodes)
+        if not registered:
+            return
+
+        result = self.ibm_vpc_client.list_instances().get_result()
+        live_ids = {instance["id"] for instance in result["instances"]}
+        while result.get("next"):
+            start = result["next"]["href"].split("start=")[1]
+            result = self.ibm_vpc_client.list_instances(start=start).get_result()
+            live_ids.update(instance["id"] for instance in result["instances"])
+
+        deleted = registered - live_ids
+        if deleted:
+            logger.debug(f"dropping pool registrations of deleted nodes {sorted(deleted)}")
+            with self.lock:
+                for node_id in deleted:
+                    self.nodes.pop(node_id, None)
+                self._dump()
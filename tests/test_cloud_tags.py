@@ -0,0 +1,209 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+
+from vpc import cloud_tags
+from vpc.cloud_tags import CloudTagStore, LocalTaggingService, decode_tag, encode_tag
+
+CLUSTER_NAME = "test-cluster"
+
+
+def crn(node_id):
+    return f"crn:v1:bluemix:public:is:us-south-1:a/account::instance:{node_id}"
+
+
+@pytest.fixture
+def service():
+    return LocalTaggingService()
+
+
+@pytest.fixture(autouse=True)
+def no_background_flush(monkeypatch):
+    # flushes are triggered explicitly by the tests
+    monkeypatch.setattr(cloud_tags, "TAG_FLUSH_INTERVAL", 3600)
+
+
+def tag_store(service, cluster_name=CLUSTER_NAME):
+    return CloudTagStore(None, cluster_name, crn, tagging_service=service, search_service=service)
+
+
+def cluster_tags(node_name, status="waiting-for-ssh"):
+    return {
+        "ray-cluster-name": CLUSTER_NAME,
+        "ray-node-kind": "worker",
+        "ray-node-name": node_name,
+        "ray-node-status": status,
+    }
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["worker", "up-to-date", "ray_worker_default", "", "Upper-Case", "a1b2:c3/d4+e5==", "b32.looks-encoded", "ünïcode"],
+)
+def test_encode_decode_round_trip(value):
+    tag = encode_tag("ray-test-key", value)
+    assert tag == tag.lower()
+    assert decode_tag(tag) == ("ray-test-key", value)
+
+
+def test_plain_values_stay_readable():
+    assert encode_tag("ray-node-status", "up-to-date") == "ray-node-status:up-to-date"
+    assert decode_tag("env:production") is None
+    assert decode_tag("ray-node-status") is None
+
+
+def test_set_tags_diffs_and_batches(service):
+    store = tag_store(service)
+    node_ids = ["node-1", "node-2", "node-3"]
+    for node_id in node_ids:
+        store.set_tags(node_id, cluster_tags(f"ray-{node_id}"))
+    store.flush()
+
+    # tags shared by all nodes are attached with a single call, node specific ones with a call per node
+    attach_calls = [call for call in service.calls if call[0] == "attach_tag"]
+    assert len(attach_calls) == 4
+    shared = next(call for call in attach_calls if len(call[1]) == 3)
+    assert sorted(shared[2]) == sorted(
+        [
+            encode_tag("ray-cluster-name", CLUSTER_NAME),
+            encode_tag("ray-node-kind", "worker"),
+            encode_tag("ray-node-status", "waiting-for-ssh"),
+        ]
+    )
+
+    # only changed tags are sent, with the replaced values detached
+    service.calls.clear()
+    for node_id in node_ids[:2]:
+        store.set_tags(node_id, cluster_tags(f"ray-{node_id}", status="up-to-date"))
+    store.set_tags(node_ids[2], cluster_tags(f"ray-{node_ids[2]}"))
+    store.flush()
+
+    updated_crns = sorted(crn(node_id) for node_id in node_ids[:2])
+    assert service.calls == [
+        ("detach_tag", updated_crns, [encode_tag("ray-node-status", "waiting-for-ssh")]),
+        ("attach_tag", updated_crns, [encode_tag("ray-node-status", "up-to-date")]),
+    ]
+
+    # nothing queued, nothing sent
+    service.calls.clear()
+    store.flush()
+    assert service.calls == []
+
+
+def test_set_tags_batch_size(service, monkeypatch):
+    monkeypatch.setattr(cloud_tags, "TAG_BATCH_SIZE", 2)
+    store = tag_store(service)
+    for i in range(5):
+        store.set_tags(f"node-{i}", {"ray-cluster-name": CLUSTER_NAME})
+    store.flush()
+
+    assert [len(crns) for _, crns, _ in service.calls] == [2, 2, 1]
+
+
+def test_load_pages(service, monkeypatch):
+    monkeypatch.setattr(cloud_tags, "SEARCH_PAGE_SIZE", 2)
+    writer = tag_store(service)
+    for i in range(5):
+        writer.set_tags(f"node-{i}", cluster_tags(f"ray-node-{i}"))
+    other_cluster = tag_store(service, "other-cluster")
+    other_cluster.set_tags("other-node", {"ray-cluster-name": "other-cluster"})
+    writer.flush()
+    other_cluster.flush()
+
+    search = service.search
+    searches = []
+
+    def counting_search(**kwargs):
+        searches.append(kwargs)
+        return search(**kwargs)
+
+    monkeypatch.setattr(service, "search", counting_search)
+
+    nodes_tags = tag_store(service).load()
+
+    assert len(searches) == 3
+    assert nodes_tags == {f"node-{i}": cluster_tags(f"ray-node-{i}") for i in range(5)}
+
+
+def test_forget(service):
+    store = tag_store(service)
+    store.set_tags("node-1", cluster_tags("ray-node-1"))
+    store.forget("node-1")
+    store.flush()
+
+    assert service.calls == []
+
+
+def test_failed_resources_are_requeued(service):
+    store = tag_store(service)
+    store.set_tags("node-1", cluster_tags("ray-node-1"))
+    store.set_tags("node-2", cluster_tags("ray-node-2"))
+    service.failing.add(crn("node-2"))
+    store.flush()
+
+    # the call succeeds, but reports node-2 as failed
+    assert store.to_attach.keys() == {"node-2"}
+    assert store.to_attach["node-2"] == {encode_tag(key, value) for key, value in cluster_tags("ray-node-2").items()}
+    assert tag_store(service).load() == {"node-1": cluster_tags("ray-node-1")}
+
+    service.failing.clear()
+    store.flush()
+
+    assert store.to_attach == {}
+    assert tag_store(service).load() == {
+        "node-1": cluster_tags("ray-node-1"),
+        "node-2": cluster_tags("ray-node-2"),
+    }
+
+
+def test_failed_detach_is_requeued(service):
+    store = tag_store(service)
+    store.set_tags("node-1", cluster_tags("ray-node-1"))
+    store.flush()
+
+    service.failing.add(crn("node-1"))
+    store.set_tags("node-1", cluster_tags("ray-node-1", status="up-to-date"))
+    store.flush()
+
+    assert store.to_detach == {"node-1": {encode_tag("ray-node-status", "waiting-for-ssh")}}
+    assert store.to_attach == {"node-1": {encode_tag("ray-node-status", "up-to-date")}}
+
+    service.failing.clear()
+    store.flush()
+
+    assert tag_store(service).load() == {"node-1": cluster_tags("ray-node-1", status="up-to-date")}
+
+
+def test_failed_call_is_requeued(service, monkeypatch):
+    store = tag_store(service)
+    store.set_tags("node-1", cluster_tags("ray-node-1"))
+
+    attach = service.attach_tag
+    unavailable = [True]
+
+    def attach_tag(**kwargs):
+        if unavailable[0]:
+            raise Exception("tagging service unavailable")
+        return attach(**kwargs)
+
+    monkeypatch.setattr(service, "attach_tag", attach_tag)
+    with pytest.raises(Exception):
+        store.flush()
+
+    unavailable[0] = False
+    store.flush()
+    assert tag_store(service).load() == {"node-1": cluster_tags("ray-node-1")}
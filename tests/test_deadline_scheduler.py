@@ -0,0 +1,106 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import queue
+import time
+
+from vpc.deadline_scheduler import DeadlineScheduler
+
+TIMEOUT = 2  # max seconds to wait for an expected expiry.
+
+
+def expired_keys(scheduler_queue, count):
+    return [scheduler_queue.get(timeout=TIMEOUT) for _ in range(count)]
+
+
+def recording_scheduler():
+    expired = queue.Queue()
+    return DeadlineScheduler(expired.put, name="test-deadlines"), expired
+
+
+def test_deadlines_expire_in_order():
+    scheduler, expired = recording_scheduler()
+    scheduler.schedule("c", 0.3)
+    scheduler.schedule("a", 0.1)
+    scheduler.schedule("b", 0.2)
+
+    assert expired_keys(expired, 3) == ["a", "b", "c"]
+
+
+def test_deadline_doesnt_expire_early():
+    scheduler, expired = recording_scheduler()
+    scheduled_at = time.time()
+    scheduler.schedule("a", 0.2)
+
+    assert expired_keys(expired, 1) == ["a"]
+    assert time.time() - scheduled_at >= 0.2
+
+
+def test_cancel():
+    scheduler, expired = recording_scheduler()
+    scheduler.schedule("cancelled", 0.1)
+    scheduler.schedule("kept", 0.2)
+    scheduler.cancel("cancelled")
+    scheduler.cancel("unknown")
+
+    assert expired_keys(expired, 1) == ["kept"]
+    assert expired.empty()
+
+
+def test_reschedule_replaces_the_active_deadline():
+    scheduler, expired = recording_scheduler()
+    scheduler.schedule("postponed", 0.1)
+    scheduler.schedule("other", 0.2)
+    scheduler.schedule("postponed", 0.3)
+
+    assert expired_keys(expired, 2) == ["other", "postponed"]
+    time.sleep(0.2)
+    assert expired.empty()
+
+
+def test_failed_handler_retries_by_rescheduling():
+    attempts = queue.Queue()
+    failures = []
+
+    def on_expired(key):
+        attempts.put(key)
+        if len(failures) < 2:
+            failures.append(key)
+            # mirrors IBMVPCNodeProvider._pending_node_expired, which reschedules a failed expiry
+            scheduler.schedule(key, 0.05)
+            raise Exception("transient failure")
+
+    scheduler = DeadlineScheduler(on_expired, name="test-deadlines")
+    scheduler.schedule("node", 0.05)
+
+    assert expired_keys(attempts, 3) == ["node"] * 3
+    time.sleep(0.2)
+    assert attempts.empty()
+
+
+def test_handler_exception_doesnt_stop_the_scheduler():
+    expired = queue.Queue()
+
+    def on_expired(key):
+        expired.put(key)
+        if key == "failing":
+            raise Exception("handler failure")
+
+    scheduler = DeadlineScheduler(on_expired, name="test-deadlines")
+    scheduler.schedule("failing", 0.05)
+    scheduler.schedule("next", 0.1)
+
+    assert expired_keys(expired, 2) == ["failing", "next"]
@@ -0,0 +1,112 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("ray")
+pytest.importorskip("ibm_vpc")
+
+from ibm_cloud_sdk_core import ApiException  # noqa: E402
+
+from vpc import node_provider  # noqa: E402
+from vpc.node_provider import IBMVPCNodeProvider  # noqa: E402
+from vpc.profile_fallbacks import ProfileFallbacks  # noqa: E402
+
+NODE_TYPE = "ray_worker_default"
+
+
+class RecordingScheduler:
+    """stands in for DeadlineScheduler, recording scheduled deadlines instead of expiring them"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def schedule(self, key, timeout):
+        self.scheduled.append((key, timeout))
+
+    def cancel(self, key):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """a provider with just the state used by pending node expiry, and without a VPC client"""
+    provider = IBMVPCNodeProvider.__new__(IBMVPCNodeProvider)
+    provider.lock = threading.RLock()
+    provider.pending_nodes = {}
+    provider.pending_deadlines = RecordingScheduler()
+    provider.profile_fallbacks = ProfileFallbacks()
+    provider.deleted = []
+    monkeypatch.setattr(provider, "_delete_node", provider.deleted.append, raising=False)
+    return provider
+
+
+def pending(provider, node_id, index=None):
+    provider.pending_nodes[node_id] = time.time()
+    provider.profile_fallbacks.created(node_id, NODE_TYPE, index)
+
+
+def test_hanging_node_is_deleted_and_counted(provider, monkeypatch):
+    pending(provider, "node-1")
+    monkeypatch.setattr(provider, "_get_vpc_node", lambda node_id: {"id": node_id, "status": "pending"})
+
+    provider._pending_node_expired("node-1")
+
+    assert provider.deleted == ["node-1"]
+    assert provider.profile_fallbacks.fallbacks[NODE_TYPE][0] == 0
+
+
+def test_running_node_is_kept(provider, monkeypatch):
+    pending(provider, "node-1")
+    monkeypatch.setattr(provider, "_get_vpc_node", lambda node_id: {"id": node_id, "status": "running"})
+
+    provider._pending_node_expired("node-1")
+
+    assert provider.deleted == []
+    assert "node-1" not in provider.pending_nodes
+    assert NODE_TYPE not in provider.profile_fallbacks.fallbacks
+
+
+def test_failed_expiry_is_retried(provider, monkeypatch):
+    pending(provider, "node-1")
+
+    def get_vpc_node(node_id):
+        raise ApiException(500, message="internal error")
+
+    monkeypatch.setattr(provider, "_get_vpc_node", get_vpc_node)
+
+    provider._pending_node_expired("node-1")
+
+    assert provider.pending_deadlines.scheduled == [("node-1", node_provider.PENDING_RETRY_INTERVAL)]
+    assert "node-1" in provider.pending_nodes
+    assert provider.deleted == []
+
+
+def test_deleted_node_is_dropped(provider, monkeypatch):
+    pending(provider, "node-1")
+
+    def get_vpc_node(node_id):
+        raise ApiException(404, message="Instance not found")
+
+    monkeypatch.setattr(provider, "_get_vpc_node", get_vpc_node)
+
+    provider._pending_node_expired("node-1")
+
+    assert "node-1" not in provider.pending_nodes
+    assert provider.pending_deadlines.scheduled == []
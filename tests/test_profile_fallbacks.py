@@ -0,0 +1,120 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import time
+
+import pytest
+
+from vpc import profile_fallbacks
+from vpc.profile_fallbacks import ProfileFallbacks
+
+NODE_TYPE = "ray_worker_default"
+BASE_CONFIG = {"instance_profile_name": "bx2-8x32", "fallback_instance_profile_names": ["bx2-4x16", "cx2-4x8"]}
+
+
+@pytest.fixture
+def fallbacks():
+    return ProfileFallbacks()
+
+
+def create(fallbacks, node_id):
+    """mirrors IBMVPCNodeProvider.create_node. returns the profile node_id is created with."""
+    config, index = fallbacks.node_config(NODE_TYPE, BASE_CONFIG)
+    fallbacks.created(node_id, NODE_TYPE, index)
+    return config["instance_profile_name"]
+
+
+def test_primary_profile_by_default(fallbacks):
+    assert fallbacks.node_config(NODE_TYPE, BASE_CONFIG) == (BASE_CONFIG, None)
+
+
+def test_no_fallbacks_configured(fallbacks):
+    config = {"instance_profile_name": "bx2-8x32"}
+    fallbacks.created("node-1", NODE_TYPE, None)
+    fallbacks.expired("node-1")
+
+    assert fallbacks.node_config(NODE_TYPE, config) == (config, None)
+
+
+def test_timeout_moves_to_next_profile(fallbacks):
+    assert create(fallbacks, "node-1") == "bx2-8x32"
+    fallbacks.expired("node-1")
+    assert create(fallbacks, "node-2") == "bx2-4x16"
+    fallbacks.expired("node-2")
+    assert create(fallbacks, "node-3") == "cx2-4x8"
+
+
+def test_out_of_fallbacks_keeps_the_last_one(fallbacks):
+    for i in range(4):
+        create(fallbacks, f"node-{i}")
+        fallbacks.expired(f"node-{i}")
+
+    assert create(fallbacks, "node-last") == "cx2-4x8"
+    fallbacks.running("node-last")
+    assert create(fallbacks, "node-next") == "cx2-4x8"
+
+
+def test_fallback_is_kept_while_its_nodes_succeed(fallbacks):
+    create(fallbacks, "node-1")
+    fallbacks.expired("node-1")
+
+    for i in range(3):
+        assert create(fallbacks, f"fallback-{i}") == "bx2-4x16"
+        fallbacks.running(f"fallback-{i}")
+
+    assert create(fallbacks, "node-2") == "bx2-4x16"
+
+
+def test_only_timeouts_of_the_current_profile_count(fallbacks):
+    create(fallbacks, "primary-1")
+    create(fallbacks, "primary-2")
+    fallbacks.expired("primary-1")
+
+    # created before the move to the fallback profile
+    fallbacks.expired("primary-2")
+
+    assert create(fallbacks, "node") == "bx2-4x16"
+
+
+def test_running_node_of_a_preferred_profile_moves_back(fallbacks):
+    create(fallbacks, "primary-1")
+    create(fallbacks, "primary-2")
+    fallbacks.expired("primary-1")
+    assert create(fallbacks, "fallback-1") == "bx2-4x16"
+
+    # the primary profile provisions again
+    fallbacks.running("primary-2")
+
+    assert create(fallbacks, "node") == "bx2-8x32"
+
+
+def test_primary_profile_is_retried_after_cooldown(fallbacks, monkeypatch):
+    create(fallbacks, "node-1")
+    fallbacks.expired("node-1")
+    assert create(fallbacks, "node-2") == "bx2-4x16"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + profile_fallbacks.PROFILE_FALLBACK_COOLDOWN + 1)
+
+    assert create(fallbacks, "node-3") == "bx2-8x32"
+
+
+def test_forgotten_nodes_dont_count(fallbacks):
+    create(fallbacks, "node-1")
+    fallbacks.forget("node-1")
+    fallbacks.expired("node-1")
+
+    assert create(fallbacks, "node-2") == "bx2-8x32"
@@ -0,0 +1,109 @@
+#
+# (C) Copyright IBM Corp. 2021
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("ibm_cloud_sdk_core")
+
+from ibm_cloud_sdk_core.token_managers.iam_token_manager import IAMTokenManager  # noqa: E402
+
+from vpc.token_cache import SharedIAMTokenManager  # noqa: E402
+
+API_KEY = "test-api-key"
+
+
+def token(expires_in=3600, remaining=3600):
+    return {"access_token": f"token-{time.time()}", "expires_in": expires_in, "expiration": time.time() + remaining}
+
+
+@pytest.fixture
+def exchanges(monkeypatch):
+    """stubs the IAM exchange, recording its calls"""
+    calls = []
+
+    def request_token(self):
+        calls.append(self.cache_key)
+        time.sleep(0.1)  # widens the window for concurrent exchanges
+        return token()
+
+    monkeypatch.setattr(IAMTokenManager, "request_token", request_token)
+    return calls
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "iam-tokens"
+
+
+def manager(cache_path, apikey=API_KEY):
+    return SharedIAMTokenManager(apikey, cache_path=cache_path)
+
+
+def test_concurrent_managers_exchange_once(exchanges, cache_path):
+    tokens = []
+    threads = [
+        threading.Thread(target=lambda: tokens.append(manager(cache_path).request_token())) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(exchanges) == 1
+    assert len({t["access_token"] for t in tokens}) == 1
+
+
+def test_fresh_token_is_reused(exchanges, cache_path):
+    first = manager(cache_path).request_token()
+    assert manager(cache_path).request_token() == first
+    assert len(exchanges) == 1
+
+
+def test_stale_token_is_refreshed(exchanges, cache_path):
+    shared = manager(cache_path)
+    stale = token(remaining=100)  # less than REFRESH_FRACTION of its lifetime left
+    cache_path.write_text(json.dumps({shared.cache_key: stale}))
+
+    refreshed = shared.request_token()
+
+    assert len(exchanges) == 1
+    assert refreshed != stale
+    assert json.loads(cache_path.read_text())[shared.cache_key] == refreshed
+
+
+def test_expired_tokens_of_other_keys_are_pruned(exchanges, cache_path):
+    expired_key = manager(cache_path, "expired-api-key").cache_key
+    fresh_key = manager(cache_path, "fresh-api-key").cache_key
+    cache_path.write_text(json.dumps({expired_key: token(remaining=-1), fresh_key: token()}))
+
+    shared = manager(cache_path)
+    shared.request_token()
+
+    assert set(json.loads(cache_path.read_text())) == {fresh_key, shared.cache_key}
+
+
+def test_corrupted_cache_is_treated_as_empty(exchanges, cache_path):
+    cache_path.write_text("{not json")
+
+    shared = manager(cache_path)
+    result = shared.request_token()
+
+    assert len(exchanges) == 1
+    assert json.loads(cache_path.read_text()) == {shared.cache_key: result}